@@ -0,0 +1,102 @@
+import queue
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# --- CONFIG ---
+# Matting model for both processing.BG_REMOVAL_MODEs; rembg's own default differs between
+# releases (u2net in older ones, bria-rmbg in newer ones), so it is always passed explicitly
+REMBG_MODEL = "u2net"
+# Number of long-lived ONNX Runtime sessions (= pages that can be matted at the same time)
+REMBG_POOL_SIZE = 1
+# ONNX Runtime threads per session, 0 = onnxruntime default
+REMBG_INTRA_OP_THREADS = 0
+REMBG_INTER_OP_THREADS = 0
+# Matting runs on a copy whose longest side is at most this many pixels (U2-Net itself works at 320x320)
+REMBG_MAX_SIDE = 1024
+
+
+def _new_session(model_name, intra_op_threads, inter_op_threads):
+    import onnxruntime as ort
+    from rembg import new_session
+    from rembg.sessions import sessions_class
+
+    sess_opts = ort.SessionOptions()
+    if intra_op_threads:
+        sess_opts.intra_op_num_threads = intra_op_threads
+    if inter_op_threads:
+        sess_opts.inter_op_num_threads = inter_op_threads
+        sess_opts.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+
+    for session_class in sessions_class:
+        if session_class.name() == model_name:
+            return session_class(model_name, sess_opts)
+    # unknown to this rembg version's session list, let rembg resolve it
+    try:
+        return new_session(model_name, sess_opts=sess_opts)
+    except TypeError:
+        # older rembg: new_session takes no session options
+        if intra_op_threads or inter_op_threads:
+            print(f"[REMBG WARN] This rembg version cannot pass session options for '{model_name}', "
+                  f"REMBG_INTRA_OP_THREADS / REMBG_INTER_OP_THREADS are ignored")
+        return new_session(model_name)
+
+
+class BackgroundRemover:
+    """
+    Background removal engine keeping a pool of warm rembg/ONNX Runtime sessions.
+    Matting runs on a downscaled copy, the mask is upsampled and applied to the full-resolution image.
+    """
+
+    def __init__(self, model_name=REMBG_MODEL, pool_size=REMBG_POOL_SIZE,
+                 intra_op_threads=REMBG_INTRA_OP_THREADS, inter_op_threads=REMBG_INTER_OP_THREADS,
+                 max_side=REMBG_MAX_SIDE):
+        self.model_name = model_name
+        self.max_side = max_side
+        self._sessions = queue.Queue()
+        for _ in range(max(1, pool_size)):
+            self._sessions.put(_new_session(model_name, intra_op_threads, inter_op_threads))
+        print(f"[REMBG] {max(1, pool_size)} '{model_name}' session(s) ready "
+              f"(intra_op={intra_op_threads or 'default'}, inter_op={inter_op_threads or 'default'})")
+
+    @contextmanager
+    def _session(self):
+        session = self._sessions.get()
+        try:
+            yield session
+        finally:
+            self._sessions.put(session)
+
+    def mask(self, image):
+        """Foreground mask (uint8, 0-255) of a BGR image, at the image's full resolution."""
+        from rembg import remove
+
+        h, w = image.shape[:2]
+        scale = min(1.0, self.max_side / max(h, w))
+        small = image
+        if scale < 1.0:
+            small = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        pil_small = Image.fromarray(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+        with self._session() as session:
+            mask = np.asarray(remove(pil_small, session=session, only_mask=True))
+        if mask.shape[:2] != (h, w):
+            mask = cv2.resize(mask, (w, h), interpolation=cv2.INTER_LINEAR)
+        return mask
+
+    def remove(self, image):
+        """
+        Arrays in, arrays out: BGR image -> (BGR cutout with black background, mask).
+        The cutout matches what rembg's default cutout gives after dropping alpha.
+        """
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        mask = self.mask(image)
+        cutout = cv2.multiply(image, cv2.merge([mask, mask, mask]), scale=1.0 / 255)
+        return cutout, mask
+
+    def remove_rgba(self, image):
+        """BGR image -> BGRA cutout (mask as alpha), e.g. for writing a transparent PNG."""
+        cutout, mask = self.remove(image)
+        return np.dstack([cutout, mask])
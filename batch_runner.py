@@ -0,0 +1,325 @@
+"""
+Local batch mode: the watcher's pipeline over a directory tree or a zip/tar archive,
+spread across worker processes, without Google Drive. PDFs and TIFFs are processed
+page by page (one worker per document).
+
+    python batch_runner.py scans/ -o out/
+    python batch_runner.py scans.tar.gz -o out/ --workers 4 --policy skip
+    python batch_runner.py hot_folder/ -o out/ --watch
+
+Results mirror the input tree under out/processed, out/text and out/audio.
+out/manifest.jsonl gets one line per file (status, quality flag, outputs, stage timings).
+Files already processed according to the manifest are not processed again, unless their
+size or modification time changed since (e.g. a file rewritten in place under the same name).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from document_input import is_document
+from drive_transfer import LocalFolderBackend
+
+# --- CONFIG ---
+BATCH_WORKERS = os.cpu_count() or 1
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+MANIFEST_NAME = "manifest.jsonl"
+# What happens to pages the quality gate flags: nobody can answer a prompt in a worker process
+BATCH_DECISION_POLICY = "continue"
+# Watch mode: a file is picked up once it has had no filesystem events for this long
+SETTLE_SECONDS = 2.0
+
+
+def _is_input(name):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS or is_document(name)
+
+
+def _file_version(size, mtime):
+    """What tells two versions of an input apart: a file rewritten under the same name gets a new one."""
+    return [size, round(mtime, 3)]
+
+
+def _safe_rel(name):
+    """Archive member / relative path reduced to plain '/'-separated components (no '..', no root)."""
+    parts = [p for p in name.replace("\\", "/").split("/") if p not in ("", ".", "..")]
+    return "/".join(parts)
+
+
+def iter_directory(root):
+    """(relative path, absolute path, version) of every input file under root, in a stable order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if _is_input(name):
+                path = os.path.join(dirpath, name)
+                st = os.stat(path)
+                version = _file_version(st.st_size, st.st_mtime)
+                yield _safe_rel(os.path.relpath(path, root)), os.path.abspath(path), version
+
+
+def iter_archive(archive_path, staging_dir):
+    """
+    (member name, staged path, version) of every input file in a zip or tar archive. Members are
+    extracted one at a time (tar is read as a stream), so the archive is never unpacked whole.
+    The version comes from the member's size and date, not from the staged copy.
+    """
+    def stage(fileobj, index, name):
+        # own subdirectory per member so the outputs keep the original file name
+        folder = os.path.join(staging_dir, f"{index:06d}")
+        os.makedirs(folder)
+        path = os.path.join(folder, os.path.basename(name))
+        with fileobj, open(path, "wb") as out:
+            shutil.copyfileobj(fileobj, out)
+        return path
+
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as zf:
+            for i, info in enumerate(zf.infolist()):
+                if not info.is_dir() and _is_input(info.filename):
+                    version = _file_version(info.file_size, time.mktime(info.date_time + (0, 0, -1)))
+                    yield _safe_rel(info.filename), stage(zf.open(info), i, info.filename), version
+    else:
+        with tarfile.open(archive_path, "r|*") as tf:
+            for i, member in enumerate(tf):
+                if member.isfile() and _is_input(member.name):
+                    version = _file_version(member.size, member.mtime)
+                    yield _safe_rel(member.name), stage(tf.extractfile(member), i, member.name), version
+
+
+# ---------- Worker process ----------
+def _init_worker(scratch_root, threads, policy):
+    # every worker gets its own working directory for the pipeline's downloads/ intermediates
+    os.chdir(tempfile.mkdtemp(prefix=f"worker-{os.getpid()}-", dir=scratch_root))
+    import cv2
+    import cnn_engine
+    import drive_ocr_watcher
+    import metrics
+
+    cv2.setNumThreads(threads)
+    cnn_engine.CNN_THREADS = threads
+    metrics.METRICS_LOG = None
+    drive_ocr_watcher.DECISION_POLICY = policy
+
+
+def process_one(src_path, rel_path, out_root):
+    """Run the processing stages on one file; returns its manifest record."""
+    import drive_ocr_watcher as w
+
+    rel_dir = os.path.dirname(rel_path)
+    folders = {name: os.path.join(name, rel_dir) for name in ("processed", "text", "audio")}
+    transfer = LocalFolderBackend(out_root, max_workers=1)
+    job = w.new_job(src_path, transfer, folders["processed"], folders["text"], folders["audio"])
+    record = {"input": rel_path, "worker": os.getpid(), "stages": {}}
+    start = time.perf_counter()
+    try:
+        if is_document(src_path):
+            job = w.process_document(job)
+            record["pages"] = job["pages"]
+        for name, stage in w.PROCESSING_STAGES:
+            if job["status"] is not None:
+                break
+            stage_start = time.perf_counter()
+            job = w.run_stage(job, name, stage)
+            record["stages"][name] = round(time.perf_counter() - stage_start, 3)
+        record["status"] = job["status"] or "error"
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+        record["stage"] = job["stage"]
+    finally:
+        shutil.rmtree("downloads", ignore_errors=True)
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    record["flagged"] = bool(job["ml_result"] and job["ml_result"][1])
+    if record["status"] == "processed":
+        paths = {"processed": job["processed_path"], "text": job["text_file_path"], "audio": job["audio_path"]}
+        record["outputs"] = {kind: os.path.join(folders[kind], os.path.basename(path)) if path else None
+                             for kind, path in paths.items()}
+    return record
+
+
+# ---------- Runner ----------
+class BatchRunner:
+    """
+    Feeds files to a pool of worker processes (at most 2 per worker in flight) and appends
+    each result to the manifest as soon as it arrives.
+    """
+
+    def __init__(self, out_root, workers=BATCH_WORKERS, policy=BATCH_DECISION_POLICY, resume=True):
+        self.out_root = os.path.abspath(out_root)
+        os.makedirs(self.out_root, exist_ok=True)
+        self.manifest_path = os.path.join(self.out_root, MANIFEST_NAME)
+        # inputs finished by an earlier run ({input: (version, finished_at)}), and the
+        # version of everything submitted by this one
+        self.previous = self._finished_inputs() if resume else {}
+        self.done = {}
+        self.counts = Counter()
+        self.scratch = tempfile.mkdtemp(prefix="soundbook-batch-")
+        workers = max(1, workers)
+        # split the cores between the processes instead of every library using all of them
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        self.pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker, initargs=(self.scratch, threads, policy))
+        self.max_pending = 2 * workers
+        self.pending = {}
+        self._manifest = open(self.manifest_path, "a", encoding="utf-8", buffering=1)
+        print(f"[BATCH] {workers} worker process(es), {threads} thread(s) each -> {self.out_root}")
+
+    def _finished_inputs(self):
+        finished = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    if record.get("status") in ("processed", "skipped"):
+                        finished[record["input"]] = (record.get("version"), record.get("finished_at"))
+        return finished
+
+    def _is_done(self, rel_path, version):
+        if self.done.get(rel_path) == version:
+            return True
+        if rel_path not in self.previous:
+            return False
+        previous_version, finished_at = self.previous[rel_path]
+        if previous_version is None:
+            # manifest line from before versions were recorded: done unless modified after it
+            return finished_at is not None and version[1] <= finished_at
+        return previous_version == version
+
+    def submit(self, rel_path, path, version, staged=False):
+        """
+        Queue one file unless this version of it is done; staged files (extracted from an
+        archive) are deleted once processed.
+        """
+        if self._is_done(rel_path, version):
+            if rel_path not in self.done:
+                self.counts["already done"] += 1
+                self.done[rel_path] = version
+            if staged:
+                shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+            return
+        self.done[rel_path] = version
+        while len(self.pending) >= self.max_pending:
+            self.collect(block=True)
+        future = self.pool.submit(process_one, path, rel_path, self.out_root)
+        self.pending[future] = (rel_path, version, path if staged else None)
+
+    def collect(self, block=False):
+        """Write the records of finished files to the manifest."""
+        if not self.pending:
+            return
+        finished, _ = wait(self.pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in finished:
+            rel_path, version, staged = self.pending.pop(future)
+            try:
+                record = future.result()
+            except Exception as e:
+                # the worker process itself died
+                record = {"input": rel_path, "status": "error", "error": f"{type(e).__name__}: {e}"}
+            record["version"] = version
+            record["finished_at"] = time.time()
+            self._manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.counts[record["status"]] += 1
+            print(f"[BATCH] {record['status']:<9} {rel_path}")
+            if staged:
+                shutil.rmtree(os.path.dirname(staged), ignore_errors=True)
+
+    def close(self):
+        while self.pending:
+            self.collect(block=True)
+        self.pool.shutdown()
+        self._manifest.close()
+        shutil.rmtree(self.scratch, ignore_errors=True)
+        print("[BATCH] Done: " + ", ".join(f"{n} {status}" for status, n in sorted(self.counts.items())))
+
+
+def run_source(source, runner):
+    """Process a directory tree or an archive."""
+    if os.path.isdir(source):
+        for rel_path, path, version in iter_directory(source):
+            runner.submit(rel_path, path, version)
+        return
+    staging = tempfile.mkdtemp(prefix="staging-", dir=runner.scratch)
+    for rel_path, path, version in iter_archive(source, staging):
+        runner.submit(rel_path, path, version, staged=True)
+
+
+def watch_folder(folder, runner, settle=SETTLE_SECONDS):
+    """
+    Hot-folder mode on filesystem events (inotify on Linux, ReadDirectoryChangesW on Windows,
+    FSEvents on macOS, via watchdog). Files already in the folder are processed first.
+    """
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+
+    changed, lock = {}, threading.Lock()
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            path = getattr(event, "dest_path", "") or event.src_path
+            if not event.is_directory and _is_input(path):
+                with lock:
+                    changed[path] = time.monotonic()
+
+    observer = Observer()
+    observer.schedule(Handler(), folder, recursive=True)
+    observer.start()
+    print(f"[BATCH] Watching {os.path.abspath(folder)} (Ctrl+C to stop)")
+    try:
+        run_source(folder, runner)
+        while True:
+            time.sleep(0.5)
+            now = time.monotonic()
+            with lock:
+                settled = [p for p, t in changed.items() if now - t >= settle]
+                for p in settled:
+                    del changed[p]
+            for path in settled:
+                if os.path.isfile(path):
+                    # a file rewritten in place comes back with a new version and is processed again
+                    st = os.stat(path)
+                    runner.submit(_safe_rel(os.path.relpath(path, folder)), os.path.abspath(path),
+                                  _file_version(st.st_size, st.st_mtime))
+            runner.collect()
+    except KeyboardInterrupt:
+        print("[BATCH] Stopping watch...")
+    finally:
+        observer.stop()
+        observer.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory, .zip or .tar(.gz/.bz2/.xz)")
+    parser.add_argument("-o", "--output", required=True, help="output tree (created if missing)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--policy", choices=["continue", "skip", "defer"], default=BATCH_DECISION_POLICY,
+                        help="what to do with pages the quality gate flags (defer = only noted in the manifest)")
+    parser.add_argument("--watch", action="store_true", help="keep running and process new files in the directory")
+    parser.add_argument("--no-resume", action="store_true", help="reprocess files already done in the manifest")
+    args = parser.parse_args()
+
+    if args.watch and not os.path.isdir(args.source):
+        parser.error("--watch needs a directory")
+    runner = BatchRunner(args.output, args.workers, args.policy, resume=not args.no_resume)
+    try:
+        if args.watch:
+            watch_folder(args.source, runner)
+        else:
+            run_source(args.source, runner)
+    finally:
+        runner.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compare skew detectors on the same inputs.
+
+    python -m benchmarks.bench_deskew                      # synthetic pages with known skew
+    python -m benchmarks.bench_deskew --images some/dir    # real photos, "projection" used as reference
+"""
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from processing import detect_skew_angle
+from benchmarks.synthetic import render_text_page
+
+MODES = ["projection", "fast"]
+
+
+def synthetic_inputs(sizes, angles):
+    for h, w in sizes:
+        for i, angle in enumerate(angles):
+            img, _ = render_text_page(h, w, angle, seed=i)
+            # the detector returns the correcting angle, i.e. the negated skew
+            yield f"{w}x{h}@{angle:+.1f}", img, -angle
+
+
+def folder_inputs(folder):
+    for path in sorted(glob.glob(os.path.join(folder, "*"))):
+        img = cv2.imread(path)
+        if img is not None:
+            yield os.path.basename(path), img, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="folder of images to use instead of synthetic pages")
+    parser.add_argument("--angles", type=float, nargs="+", default=[-30.0, -7.3, -0.6, 0.0, 2.4, 11.8, 40.5])
+    parser.add_argument("--sizes", nargs="+", default=["1500x1100", "4000x3000"], help="HxW of synthetic pages")
+    args = parser.parse_args()
+
+    if args.images:
+        inputs = folder_inputs(args.images)
+    else:
+        sizes = [tuple(int(v) for v in s.split("x")) for s in args.sizes]
+        inputs = synthetic_inputs(sizes, args.angles)
+
+    errors = {m: [] for m in MODES}
+    times = {m: [] for m in MODES}
+    print(f"{'input':<22}" + "".join(f"{m + ' (deg)':>18}{m + ' (s)':>16}" for m in MODES))
+    for name, img, truth in inputs:
+        results = {}
+        for mode in MODES:
+            start = time.perf_counter()
+            results[mode] = float(detect_skew_angle(img, mode))
+            times[mode].append(time.perf_counter() - start)
+        reference = truth if truth is not None else results["projection"]
+        for mode in MODES:
+            errors[mode].append(abs(results[mode] - reference))
+        print(f"{name:<22}" + "".join(f"{results[m]:>18.2f}{times[m][-1]:>16.3f}" for m in MODES))
+
+    ref_name = "ground truth" if not args.images else "projection mode"
+    print(f"\nSummary (error vs {ref_name}):")
+    for mode in MODES:
+        print(f"  {mode:<11} mean |err| = {np.mean(errors[mode]):.2f}°  max |err| = {np.max(errors[mode]):.2f}°"
+              f"  mean time = {np.mean(times[mode]):.3f}s")
+    speedup = np.mean(times["projection"]) / np.mean(times["fast"])
+    print(f"  fast mode speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
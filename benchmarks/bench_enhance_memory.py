@@ -0,0 +1,111 @@
+"""
+Peak memory and time of enhance_for_ocr_auto, "full" vs "lowmem", on corpus pages.
+
+    python -m benchmarks.bench_enhance_memory
+    python -m benchmarks.bench_enhance_memory --resolutions 8000x6000 --conditions normal noisy
+
+Every measurement runs in a fresh subprocess that loads the page from a PNG, then resets
+the kernel's peak-RSS counter (Linux /proc/self/clear_refs), so the peak can be attributed
+to the enhancement alone:
+  rss_mb     peak RSS growth over the RSS right after loading the page (all allocations,
+             including OpenCV's internal buffers)
+  traced_mb  tracemalloc peak (numpy arrays and OpenCV outputs only)
+The last column checks that both modes produce the same pixels.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from benchmarks import corpus
+
+MODES = ["full", "lowmem"]
+
+
+def _proc_status_mb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise KeyError(field)
+
+
+def _reset_peak_rss():
+    """Start a new VmHWM (peak RSS) window; Linux only."""
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+def worker(mode, image_path, out_path):
+    import metrics
+    import processing
+
+    metrics.METRICS_LOG = None
+    img = cv2.imread(image_path)
+    base_rss = _proc_status_mb("VmRSS")
+    _reset_peak_rss()
+    tracemalloc.start()
+    start = time.perf_counter()
+    out = processing.enhance_for_ocr_auto(img, deskew_mode="fast", mode=mode)
+    seconds = time.perf_counter() - start
+    traced = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    tracemalloc.stop()
+    rss = _proc_status_mb("VmHWM") - base_rss
+    cv2.imwrite(out_path, out if out.ndim == 2 else cv2.cvtColor(out, cv2.COLOR_BGR2GRAY))
+    print(json.dumps({"seconds": seconds, "rss_mb": rss, "traced_mb": traced}))
+
+
+def measure(mode, image_path, out_path):
+    cmd = [sys.executable, "-m", "benchmarks.bench_enhance_memory", "--worker", mode, image_path, out_path]
+    result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", nargs="+", default=["2400x1800", "4000x3000", "8000x6000"], help="HxW list")
+    parser.add_argument("--conditions", nargs="+", default=corpus.CONDITIONS)
+    parser.add_argument("--worker", nargs=3, metavar=("MODE", "IMAGE", "OUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(*args.worker)
+        return
+
+    print(f"{'page':<24}" + "".join(f"{m + ' s':>12}{m + ' rss MB':>16}{m + ' traced MB':>19}" for m in MODES)
+          + f"{'same pixels':>13}")
+    totals = {m: {"rss_mb": 0.0, "traced_mb": 0.0} for m in MODES}
+    with tempfile.TemporaryDirectory() as tmp:
+        for res in args.resolutions:
+            height, width = (int(v) for v in res.split("x"))
+            for condition in args.conditions:
+                img, _ = corpus.make_page(height, width, condition)
+                image_path = os.path.join(tmp, "page.png")
+                cv2.imwrite(image_path, img)
+                del img
+                row, outputs = {}, {}
+                for mode in MODES:
+                    outputs[mode] = os.path.join(tmp, f"out_{mode}.png")
+                    row[mode] = measure(mode, image_path, outputs[mode])
+                    for key in totals[mode]:
+                        totals[mode][key] = max(totals[mode][key], row[mode][key])
+                same = np.array_equal(*(cv2.imread(outputs[m], cv2.IMREAD_GRAYSCALE) for m in MODES))
+                print(f"{width}x{height} {condition:<14}"
+                      + "".join(f"{row[m]['seconds']:>12.3f}{row[m]['rss_mb']:>16.1f}{row[m]['traced_mb']:>19.1f}"
+                                for m in MODES)
+                      + f"{str(same):>13}")
+
+    print("\nWorst-case peak:")
+    for mode in MODES:
+        print(f"  {mode:<8} rss +{totals[mode]['rss_mb']:.1f} MB, traced {totals[mode]['traced_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
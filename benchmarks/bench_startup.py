@@ -0,0 +1,76 @@
+"""
+Startup cost of the watcher: import time of the main modules and time to the first result.
+
+    python -m benchmarks.bench_startup --model-dir models
+    python -m benchmarks.bench_startup --model-dir models --io-wait 2.0 --repeat 5
+
+Every measurement runs in a fresh interpreter (wall time includes interpreter startup).
+First result = one corpus page through the quality gate, the rembg import and the enhancement:
+  cold  models load on first use, after the simulated Drive auth/download wait (--io-wait)
+  warm  drive_ocr_watcher.warm_up() runs during that wait, as watch_drive_folder does
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODULES = ["processing", "ml_model", "drive_ocr_watcher"]
+
+_FIRST_RESULT = """
+import time
+import cv2
+import drive_ocr_watcher as w
+from benchmarks import corpus
+if {warm}:
+    w.warm_up()
+time.sleep({io_wait})  # Drive auth, listing and download
+import rembg  # first use of background removal (u2net itself is not run here)
+img, _ = corpus.make_page(2400, 1800, "normal")
+cv2.imwrite({path!r}, img)
+from ml_model import process_for_ocr
+image, bad = process_for_ocr({path!r}, *w.get_models())
+w.processing.enhance_for_ocr_auto(image)
+"""
+
+
+def _run(code, env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True, env=env)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default="models")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--io-wait", type=float, default=1.0, help="seconds of simulated network time before the first page")
+    args = parser.parse_args()
+
+    env = dict(os.environ, SOUNDBOOK_MODEL_DIR=os.path.abspath(args.model_dir))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+
+    baseline = statistics.median(_run("pass", env) for _ in range(args.repeat))
+    print(f"{'interpreter startup':<28}{baseline:>8.2f}s")
+    for module in MODULES:
+        seconds = statistics.median(_run(f"import {module}", env) for _ in range(args.repeat))
+        print(f"{'import ' + module:<28}{seconds - baseline:>8.2f}s")
+
+    if not os.path.exists(os.path.join(args.model_dir, "cnn_fold5.pth")):
+        print(f"\ncnn_fold5.pth not in {args.model_dir}, skipping first-result latency.")
+        return
+    print(f"\nFirst result (io wait {args.io_wait:.1f}s):")
+    path = os.path.abspath("bench_startup_page.png")
+    try:
+        for label, warm in (("cold", False), ("warm", True)):
+            totals = [_run(_FIRST_RESULT.format(warm=warm, io_wait=args.io_wait, path=path), env)
+                      for _ in range(args.repeat)]
+            print(f"  {label:<8}{statistics.median(totals):>8.2f}s")
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
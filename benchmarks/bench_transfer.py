@@ -0,0 +1,53 @@
+"""
+Transfer-layer throughput, offline, on LocalFolderBackend with simulated per-call latency.
+
+    python -m benchmarks.bench_transfer --files 24 --size-mb 4 --latency 0.2
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from drive_transfer import LocalFolderBackend
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=24)
+    parser.add_argument("--size-mb", type=float, default=4.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds added to every call")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "src")
+        os.makedirs(src)
+        payload = os.urandom(int(args.size_mb * 1024 * 1024))
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(src, f"page_{i:04d}.png")
+            with open(path, "wb") as fh:
+                fh.write(payload)
+            paths.append(path)
+        total_mb = args.files * args.size_mb
+
+        print(f"{args.files} files x {args.size_mb} MB, {args.latency}s latency per call")
+        for workers in args.workers:
+            backend = LocalFolderBackend(os.path.join(tmp, f"drive_{workers}"), max_workers=workers,
+                                         latency=args.latency)
+            start = time.perf_counter()
+            backend.upload_many([(p, "Images") for p in paths])
+            up = time.perf_counter() - start
+
+            files = backend.list_files("Images")
+            out_dir = os.path.join(tmp, f"down_{workers}")
+            os.makedirs(out_dir)
+            start = time.perf_counter()
+            backend.download_many([(f, os.path.join(out_dir, f["title"])) for f in files])
+            down = time.perf_counter() - start
+            print(f"  workers={workers:<3} upload {up:6.2f}s ({total_mb / up:7.1f} MB/s)"
+                  f"   download {down:6.2f}s ({total_mb / down:7.1f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
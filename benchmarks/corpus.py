@@ -0,0 +1,66 @@
+"""
+Reproducible synthetic page corpus. Every page is rendered from a fixed seed, so the
+same (resolution, condition) always gives the same pixels.
+
+Conditions are built to hit every branch of processing.enhance_for_ocr_auto:
+  normal        brightness/contrast/variance inside the "normal" band -> normalize_lighting
+  dark          mean < 80                                              -> fix_brightness + CLAHE
+  low_contrast  std < 40                                               -> enhance_contrast
+  noisy         var > 2000 from gaussian noise                         -> reduce_noise
+  skewed        normal page rotated by a known angle                   -> deskew
+  photo         page on a textured background (for background removal)
+"""
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import render_text_page
+
+# (height, width) of the default corpus: ~1 MP, ~4 MP and ~12 MP
+RESOLUTIONS = [(1200, 900), (2400, 1800), (4000, 3000)]
+CONDITIONS = ["normal", "dark", "low_contrast", "noisy", "skewed", "photo"]
+SKEW_ANGLE = 6.5
+
+
+def _set_stats(gray, mean, std):
+    """Linearly map gray so it has the given mean and standard deviation."""
+    g = gray.astype(np.float32)
+    g = (g - g.mean()) / max(g.std(), 1e-6) * std + mean
+    return np.clip(g, 0, 255).astype(np.uint8)
+
+
+def make_page(height, width, condition, seed=0):
+    """One BGR test page plus its ground truth: {"words": [...], "angle": correcting angle}."""
+    rng = np.random.default_rng(seed)
+    angle = SKEW_ANGLE if condition == "skewed" else 0.0
+    gray, words = render_text_page(height, width, angle, seed=seed)
+
+    if condition in ("normal", "skewed"):
+        gray = _set_stats(gray, 200, 42)
+    elif condition == "dark":
+        gray = _set_stats(gray, 60, 35)
+    elif condition == "low_contrast":
+        gray = _set_stats(gray, 170, 25)
+    elif condition == "noisy":
+        gray = _set_stats(gray, 170, 30)
+        gray = np.clip(gray + rng.normal(0, 45, gray.shape), 0, 255).astype(np.uint8)
+
+    img = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+    if condition == "photo":
+        # page at ~70% of the frame on a noisy colored "table"
+        bg = np.empty_like(img)
+        bg[:] = (60, 90, 130)
+        bg = cv2.add(bg, rng.integers(0, 40, bg.shape, dtype=np.uint8))
+        ph, pw = int(height * 0.7), int(width * 0.7)
+        page = cv2.resize(img, (pw, ph), interpolation=cv2.INTER_AREA)
+        y0, x0 = (height - ph) // 2, (width - pw) // 2
+        bg[y0:y0 + ph, x0:x0 + pw] = page
+        img = bg
+    return img, {"words": words, "angle": -angle}
+
+
+def generate(resolutions=None, conditions=None, seed=0):
+    """Yield (name, bgr_image, truth) for every resolution x condition."""
+    for height, width in resolutions or RESOLUTIONS:
+        for i, condition in enumerate(conditions or CONDITIONS):
+            img, truth = make_page(height, width, condition, seed=seed + i)
+            yield f"{width}x{height}_{condition}", img, truth
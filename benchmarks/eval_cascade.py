@@ -0,0 +1,90 @@
+"""
+Cascaded quality gate (ml_model.GATE_MODE = "cascade") against the dual RF + CNN gate.
+
+    python -m benchmarks.eval_cascade --images some/dir
+    python -m benchmarks.eval_cascade --images some/dir --bands 0.2-0.8 0.3-0.7 0.4-0.6 --max-side 512
+
+Every page is run once through the dual gate (full-resolution RF + CNN) and once through
+the cascade's RF on the downsampled page; the bands are then evaluated from those votes.
+For each band it reports the share of pages the RF decides alone (early exit), how often
+the cascade's verdict differs from the dual verdict, and the gate time per page.
+Without --images the synthetic corpus is used, which only exercises timing.
+"""
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+import ml_model
+from benchmarks import corpus
+
+
+def load_images(folder):
+    if folder is None:
+        return [(name, img) for name, img, _ in corpus.generate(resolutions=[(2400, 1800)])]
+    images = []
+    for path in sorted(glob.glob(os.path.join(folder, "*"))):
+        img = cv2.imread(path)
+        if img is not None:
+            images.append((os.path.basename(path), img))
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="folder of page photos")
+    parser.add_argument("--model-dir", default="models")
+    parser.add_argument("--bands", nargs="+", default=["0.2-0.8", "0.3-0.7", "0.4-0.6"], help="low-high P(bad) bands")
+    parser.add_argument("--max-side", type=int, default=ml_model.CASCADE_MAX_SIDE)
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.model_dir, "cnn_fold5.pth")):
+        print(f"cnn_fold5.pth not in {args.model_dir}, the dual gate cannot run.")
+        return
+    rf_model, cnn_model, device = ml_model.load_models(args.model_dir)
+    images = load_images(args.images)
+    if not images:
+        print("No images found.")
+        return
+    bad_column = list(rf_model.classes_).index(1)
+
+    dual, p_bad, cnn_preds = [], [], []
+    rf_full_s = rf_small_s = cnn_s = 0.0
+    for _, img in images:
+        start = time.perf_counter()
+        features = ml_model.features_from_gray(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+        rf_pred = int(rf_model.predict(np.array(features).reshape(1, -1))[0])
+        rf_full_s += time.perf_counter() - start
+
+        start = time.perf_counter()
+        cnn_pred = ml_model.cnn_predict([img], cnn_model, device)[0]
+        cnn_s += time.perf_counter() - start
+        dual.append(ml_model.gate_verdict(rf_pred, cnn_pred))
+        cnn_preds.append(cnn_pred)
+
+        start = time.perf_counter()
+        features = ml_model.features_from_gray(ml_model.downsample_gray(img, args.max_side))
+        p_bad.append(rf_model.predict_proba(np.array(features).reshape(1, -1))[0, bad_column])
+        rf_small_s += time.perf_counter() - start
+
+    n = len(images)
+    print(f"{n} page(s); dual gate {1000 * (rf_full_s + cnn_s) / n:.1f} ms/page "
+          f"(RF {1000 * rf_full_s / n:.1f} ms, CNN {1000 * cnn_s / n:.1f} ms)\n")
+    print(f"{'band':<12}{'early exit':>12}{'disagree':>10}{'ms/page':>10}")
+    for band in args.bands:
+        low, high = (float(v) for v in band.split("-"))
+        early = disagree = 0
+        for p, cnn_pred, dual_verdict in zip(p_bad, cnn_preds, dual):
+            unsure = low <= p <= high
+            early += not unsure
+            verdict = ml_model.gate_verdict(int(p >= 0.5), cnn_pred if unsure else None)
+            disagree += verdict != dual_verdict
+        ms = 1000 * (rf_small_s + cnn_s * (n - early) / n) / n
+        print(f"{band:<12}{early / n:>12.1%}{disagree / n:>10.1%}{ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
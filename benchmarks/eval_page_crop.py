@@ -0,0 +1,155 @@
+"""
+Page cropping after background removal (processing.PAGE_CROP_MODE) against the full frame.
+
+    python -m benchmarks.eval_page_crop                      # synthetic phone-photo cutouts
+    python -m benchmarks.eval_page_crop --images some/dir    # background-removed PNGs (rembg output)
+    python -m benchmarks.eval_page_crop --modes none bbox rectify --repeat 3
+    python -m benchmarks.eval_page_crop --edges soft         # only the soft-alpha cutouts
+
+For every mode it reports the share of the frame kept and the time of the crop, the
+enhancement (including deskew) and OCR. OCR accuracy is the share of ground-truth words
+found (synthetic pages) or, for real images, the text's similarity to the "none" output.
+OCR columns need the tesseract binary.
+"""
+import argparse
+import difflib
+import glob
+import os
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+
+import metrics
+import processing
+from benchmarks import corpus
+from benchmarks.run_benchmarks import _tesseract_available
+
+
+def cutout(height, width, seed, page_share=0.45, skew=0.06, soft=False):
+    """
+    A text page as rembg leaves a phone photo: the page somewhere in the frame, seen at a
+    slight angle (random perspective), everything around it black. With soft, the frame is
+    a photo multiplied by a soft alpha instead, like rembg's cutouts: blurred page edges and a
+    faint haze of mask values over the background. Returns (image, words).
+    """
+    rng = np.random.default_rng(seed)
+    scale = np.sqrt(page_share)
+    ph, pw = int(height * scale), int(width * scale)
+    page, truth = corpus.make_page(ph, pw, "normal", seed=seed)
+    y0, x0 = rng.integers(0, height - ph), rng.integers(0, width - pw)
+    src = np.float32([[0, 0], [pw, 0], [pw, ph], [0, ph]])
+    jitter = rng.uniform(-skew, skew, (4, 2)) * [pw, ph]
+    matrix = cv2.getPerspectiveTransform(src, np.float32(src + [x0, y0] + jitter))
+    if not soft:
+        # border value 0: the "removed" background
+        frame = cv2.warpPerspective(page, matrix, (width, height), flags=cv2.INTER_LINEAR, borderValue=(0, 0, 0))
+        return frame, truth["words"]
+    # a desk: smooth gray-brown texture the page lies on
+    desk = cv2.resize(rng.uniform(60, 180, (6, 8, 3)).astype(np.float32), (width, height), interpolation=cv2.INTER_CUBIC)
+    photo = cv2.warpPerspective(page.astype(np.float32), matrix, (width, height), dst=desk,
+                                flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_TRANSPARENT)
+    alpha = cv2.warpPerspective(np.ones((ph, pw), np.float32), matrix, (width, height), flags=cv2.INTER_LINEAR)
+    blur = 2 * (max(height, width) // 400) + 1
+    alpha = cv2.GaussianBlur(alpha, (blur, blur), 0)
+    haze = cv2.resize(rng.uniform(0.02, 0.2, (6, 8)).astype(np.float32), (width, height), interpolation=cv2.INTER_CUBIC)
+    alpha = np.maximum(alpha, np.clip(haze, 0, 1))
+    frame = np.uint8(np.clip(photo * alpha[:, :, None], 0, 255))
+    return frame, truth["words"]
+
+
+def load_inputs(folder, sizes, count, edges=("hard",)):
+    if folder is None:
+        return [(f"{w}x{h}_{i}" + ("_soft" if edge == "soft" else ""), *cutout(h, w, seed=i, soft=edge == "soft"))
+                for h, w in sizes for i in range(count) for edge in edges]
+    inputs = []
+    for path in sorted(glob.glob(os.path.join(folder, "*"))):
+        img = cv2.imread(path)
+        if img is not None:
+            inputs.append((os.path.basename(path), img, None))
+    return inputs
+
+
+def word_recall(text, words):
+    found = Counter(text.split())
+    truth = Counter(words)
+    return sum(min(n, found[w]) for w, n in truth.items()) / max(1, sum(truth.values()))
+
+
+def run_mode(img, mode, ocr, repeat):
+    """(share of pixels kept, crop s, enhance s, ocr s, text), best of repeat."""
+    crop_t, enhance_t, ocr_t = [], [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        page = processing.crop_to_page(img, mode)
+        crop_t.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        processed = processing.enhance_for_ocr_auto(page)
+        enhance_t.append(time.perf_counter() - start)
+        text = ""
+        if ocr:
+            start = time.perf_counter()
+            text = processing.pytesseract_ocr(processed)
+            ocr_t.append(time.perf_counter() - start)
+    kept = page.shape[0] * page.shape[1] / (img.shape[0] * img.shape[1])
+    return kept, min(crop_t), min(enhance_t), min(ocr_t) if ocr_t else None, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="folder of background-removed images")
+    parser.add_argument("--modes", nargs="+", default=["none", "bbox", "rectify"])
+    parser.add_argument("--sizes", nargs="+", default=["2400x1800", "4000x3000"], help="HxW of synthetic frames")
+    parser.add_argument("--count", type=int, default=3, help="synthetic frames per size")
+    parser.add_argument("--edges", nargs="+", choices=["hard", "soft"], default=["hard", "soft"],
+                        help="synthetic background: exactly black, or a photo under a soft rembg-like alpha")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    metrics.METRICS_LOG = None
+    ocr = _tesseract_available()
+    if not ocr:
+        print("tesseract not found: timing only, no OCR columns.\n")
+    sizes = [tuple(int(v) for v in s.split("x")) for s in args.sizes]
+    inputs = load_inputs(args.images, sizes, args.count, args.edges)
+
+    totals = {mode: {"kept": [], "crop": [], "enhance": [], "ocr": [], "acc": []} for mode in args.modes}
+    print(f"{'input':<22}{'mode':<9}{'kept':>7}{'crop s':>9}{'enhance s':>11}{'ocr s':>8}{'accuracy':>10}")
+    for name, img, words in inputs:
+        reference = None
+        for mode in args.modes:
+            kept, crop_s, enhance_s, ocr_s, text = run_mode(img, mode, ocr, args.repeat)
+            acc = None
+            if ocr:
+                if words is not None:
+                    acc = word_recall(text, words)
+                else:
+                    # real images: agreement with the uncropped path
+                    reference = text if reference is None else reference
+                    acc = difflib.SequenceMatcher(None, reference, text).ratio()
+            row = totals[mode]
+            row["kept"].append(kept)
+            row["crop"].append(crop_s)
+            row["enhance"].append(enhance_s)
+            if ocr:
+                row["ocr"].append(ocr_s)
+                row["acc"].append(acc)
+            print(f"{name:<22}{mode:<9}{kept:>7.0%}{crop_s:>9.3f}{enhance_s:>11.3f}"
+                  + (f"{ocr_s:>8.2f}{acc:>10.1%}" if ocr else f"{'-':>8}{'-':>10}"))
+
+    print("\nMean per page:")
+    base = totals[args.modes[0]]
+    for mode in args.modes:
+        row = totals[mode]
+        total = np.mean(row["crop"]) + np.mean(row["enhance"]) + (np.mean(row["ocr"]) if ocr else 0)
+        base_total = np.mean(base["crop"]) + np.mean(base["enhance"]) + (np.mean(base["ocr"]) if ocr else 0)
+        line = (f"  {mode:<8} kept {np.mean(row['kept']):>4.0%}  crop {np.mean(row['crop']):.3f}s"
+                f"  enhance {np.mean(row['enhance']):.3f}s")
+        if ocr:
+            line += f"  ocr {np.mean(row['ocr']):.2f}s  accuracy {np.mean(row['acc']):.1%}"
+        print(line + f"  total {total:.2f}s ({base_total / total:.2f}x vs {args.modes[0]})")
+
+
+if __name__ == "__main__":
+    main()
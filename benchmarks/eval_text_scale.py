@@ -0,0 +1,98 @@
+"""
+Text-height normalization (processing.TEXT_SCALE_MODE = "xheight") across input resolutions.
+
+    python -m benchmarks.eval_text_scale
+    python -m benchmarks.eval_text_scale --sizes 800x600 4000x3000 8000x6000 --targets 16 20 28
+    python -m benchmarks.eval_text_scale --images some/dir
+
+For every page and every target x-height (plus native resolution) it reports the estimated
+x-height (and the true one for synthetic pages), the size the page is processed at, the
+enhancement and OCR time and the OCR accuracy: share of ground-truth words found for
+synthetic pages, similarity to the native-resolution text for real images.
+OCR columns need the tesseract binary.
+"""
+import argparse
+import difflib
+import time
+
+import numpy as np
+
+import metrics
+import processing
+from benchmarks import corpus
+from benchmarks.eval_page_crop import load_inputs, word_recall
+from benchmarks.run_benchmarks import _tesseract_available
+
+# benchmarks.synthetic renders with cv2 font scale height/1500; lowercase letters are 15 px at scale 1
+_SYNTHETIC_X_HEIGHT = 15 / 1500
+
+
+def run(img, target, ocr):
+    """(processed width x height, enhance s, ocr s, text) with target x-height (None = native)."""
+    mode = "xheight" if target else "none"
+    start = time.perf_counter()
+    processed = processing.enhance_for_ocr_auto(processing.normalize_text_scale(img, mode, target), mode="full")
+    enhance_s = time.perf_counter() - start
+    ocr_s, text = None, ""
+    if ocr:
+        start = time.perf_counter()
+        text = processing.pytesseract_ocr(processed)
+        ocr_s = time.perf_counter() - start
+    return f"{processed.shape[1]}x{processed.shape[0]}", enhance_s, ocr_s, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="folder of page photos")
+    parser.add_argument("--sizes", nargs="+", default=["800x600", "1500x1125", "2400x1800", "4000x3000", "8000x6000"],
+                        help="HxW of synthetic pages")
+    parser.add_argument("--conditions", nargs="+", default=["normal", "noisy"])
+    parser.add_argument("--targets", type=int, nargs="+", default=[processing.TEXT_X_HEIGHT])
+    args = parser.parse_args()
+
+    metrics.METRICS_LOG = None
+    ocr = _tesseract_available()
+    if not ocr:
+        print("tesseract not found: timing only, no OCR columns.\n")
+    if args.images:
+        inputs = [(name, img, None, None) for name, img, _ in load_inputs(args.images, [], 0)]
+    else:
+        sizes = [tuple(int(v) for v in s.split("x")) for s in args.sizes]
+        inputs = [(name, img, truth["words"], _SYNTHETIC_X_HEIGHT * int(name.split("x")[1].split("_")[0]))
+                  for name, img, truth in corpus.generate(resolutions=sizes, conditions=args.conditions)]
+    # the enhancement below runs with the given target only, not the configured mode
+    processing.TEXT_SCALE_MODE = "none"
+
+    configs = [None] + args.targets
+    totals = {c: {"enhance": [], "ocr": [], "acc": []} for c in configs}
+    print(f"{'input':<24}{'x-height':>9}{'true':>6}{'target':>8}{'size':>11}{'enhance s':>11}{'ocr s':>8}{'accuracy':>10}")
+    for name, img, words, true_x in inputs:
+        x_height = processing.estimate_x_height(img)
+        reference = None
+        for target in configs:
+            size, enhance_s, ocr_s, text = run(img, target, ocr)
+            acc = None
+            if ocr:
+                if words is not None:
+                    acc = word_recall(text, words)
+                else:
+                    reference = text if reference is None else reference
+                    acc = difflib.SequenceMatcher(None, reference, text).ratio()
+                totals[target]["ocr"].append(ocr_s)
+                totals[target]["acc"].append(acc)
+            totals[target]["enhance"].append(enhance_s)
+            print(f"{name:<24}{x_height or float('nan'):>9.1f}{true_x or float('nan'):>6.1f}{target or 'native':>8}"
+                  f"{size:>11}{enhance_s:>11.3f}"
+                  + (f"{ocr_s:>8.2f}{acc:>10.1%}" if ocr else f"{'-':>8}{'-':>10}"))
+
+    print("\nMean per page:")
+    for target in configs:
+        row = totals[target]
+        line = f"  {'native' if target is None else f'x-height {target}px':<14} enhance {np.mean(row['enhance']):.3f}s"
+        if ocr:
+            line += f"  ocr {np.mean(row['ocr']):.2f}s  accuracy {np.mean(row['acc']):.1%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Per-stage benchmark of processing.py / ml_model.py on the synthetic corpus (benchmarks/corpus.py).
+CPU only, no network: stages whose models/binaries are not available locally are skipped.
+
+    python -m benchmarks.run_benchmarks                          # run and print
+    python -m benchmarks.run_benchmarks --save-baseline          # store results as the baseline
+    python -m benchmarks.run_benchmarks --compare                # fail (exit 1) on regressions
+    python -m benchmarks.run_benchmarks --stages enhance_for_ocr_auto detect_skew_fast --resolutions 2400x1800
+
+Times are the median of --repeat runs, summed over the corpus conditions of a resolution.
+Peak memory is tracemalloc's peak, which covers numpy/OpenCV output arrays but not
+buffers allocated inside native libraries (onnxruntime, torch, tesseract).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import corpus
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+# A stage is a regression when it is this much slower than the baseline
+DEFAULT_THRESHOLD = 0.20
+
+
+def _rembg_model_available():
+    home = os.environ.get("U2NET_HOME", os.path.join(os.path.expanduser("~"), ".u2net"))
+    return os.path.exists(os.path.join(home, "u2net.onnx"))
+
+
+def _tesseract_available():
+    import pytesseract
+    cmd = pytesseract.pytesseract.tesseract_cmd
+    return os.path.exists(cmd) or shutil.which(cmd) is not None
+
+
+def build_stages(model_dir):
+    """{name: fn(bgr_image, tmp_path) -> anything}, plus {name: reason} for skipped stages."""
+    import metrics
+    import processing
+
+    # keep the stage timers in memory only, the benchmark should not measure log writes
+    metrics.METRICS_LOG = None
+    stages = {
+        "analyze_image": lambda img, _: processing.analyze_image(img),
+        "fix_brightness": lambda img, _: processing.fix_brightness(img, 1.5),
+        "enhance_contrast": lambda img, _: processing.enhance_contrast(img, 1.5),
+        "reduce_noise": lambda img, _: processing.reduce_noise(img, 1.5),
+        "normalize_lighting": lambda img, _: processing.normalize_lighting(img),
+        "binarize_adaptive": lambda img, _: processing.binarize_adaptive(img),
+        "detect_skew_projection": lambda img, _: processing.detect_skew_angle(img, "projection"),
+        "detect_skew_fast": lambda img, _: processing.detect_skew_angle(img, "fast"),
+        "deskew_and_expand": lambda img, _: processing.deskew_and_expand(img, 6.5),
+        "enhance_for_ocr_auto": lambda img, _: processing.enhance_for_ocr_auto(img),
+        "enhance_for_ocr_lowmem": lambda img, _: processing.enhance_for_ocr_auto(img, mode="lowmem"),
+    }
+    skipped = {}
+
+    if _rembg_model_available():
+        stages["remove_background"] = lambda img, path: processing.remove_background(path, path + ".bg.png")
+    else:
+        skipped["remove_background"] = "u2net.onnx not in U2NET_HOME (~/.u2net)"
+
+    if _tesseract_available():
+        stages["pytesseract_ocr"] = lambda img, _: processing.pytesseract_ocr(processing.enhance_for_ocr_auto(img))
+    else:
+        skipped["pytesseract_ocr"] = "tesseract binary not found"
+
+    if os.path.exists(os.path.join(model_dir, "cnn_fold5.pth")):
+        import ml_model
+        rf_model, cnn_model, device = ml_model.load_models(model_dir)
+        stages["predict_image"] = lambda img, path: ml_model.predict_image(path, rf_model, cnn_model, device)
+    else:
+        skipped["predict_image"] = f"cnn_fold5.pth not in {model_dir}"
+    return stages, skipped
+
+
+def measure(fn, img, path, repeat):
+    """(median seconds, peak traced MB) of fn over repeat runs, with the pipeline's prints silenced."""
+    times, peak = [], 0
+    for _ in range(repeat):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn(img, path)
+            times.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    return statistics.median(times), peak / 1024 ** 2
+
+
+def run(stage_names, resolutions, repeat, model_dir):
+    import cv2
+
+    stages, skipped = build_stages(model_dir)
+    for name, reason in skipped.items():
+        print(f"[SKIP] {name}: {reason}")
+    if stage_names:
+        stages = {name: fn for name, fn in stages.items() if name in stage_names}
+
+    results = {}
+    tracemalloc.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        for height, width in resolutions:
+            pages = list(corpus.generate(resolutions=[(height, width)]))
+            paths = []
+            for name, img, _ in pages:
+                path = os.path.join(tmp, name + ".png")
+                cv2.imwrite(path, img)
+                paths.append(path)
+            megapixels = height * width / 1e6
+            for stage, fn in stages.items():
+                total, peak = 0.0, 0.0
+                for (name, img, _), path in zip(pages, paths):
+                    seconds, mb = measure(fn, img, path, repeat)
+                    total += seconds
+                    peak = max(peak, mb)
+                key = f"{stage}@{width}x{height}"
+                results[key] = {
+                    "seconds": round(total, 4),
+                    "images_per_s": round(len(pages) / total, 3) if total else None,
+                    "mp_per_s": round(len(pages) * megapixels / total, 2) if total else None,
+                    "peak_mb": round(peak, 1),
+                }
+                r = results[key]
+                print(f"{key:<42} {r['seconds']:>9.3f}s {r['images_per_s']:>9.2f} img/s "
+                      f"{r['mp_per_s']:>9.2f} MP/s {r['peak_mb']:>9.1f} MB peak")
+    tracemalloc.stop()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the comparison with the baseline; returns the list of regressed keys."""
+    regressions = []
+    print(f"\nComparison with baseline (regression threshold +{threshold:.0%}):")
+    for key, cur in results.items():
+        base = baseline.get(key)
+        if base is None:
+            print(f"  {key:<42} new")
+            continue
+        ratio = cur["seconds"] / base["seconds"] if base["seconds"] else 1.0
+        mem_ratio = cur["peak_mb"] / base["peak_mb"] if base["peak_mb"] else 1.0
+        flag = ""
+        if ratio > 1 + threshold or mem_ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print(f"  {key:<42} time x{ratio:5.2f}  peak mem x{mem_ratio:5.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", help="only run these stages")
+    parser.add_argument("--resolutions", nargs="+", help="HxW list, default: corpus.RESOLUTIONS")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--model-dir", default="models")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    resolutions = corpus.RESOLUTIONS
+    if args.resolutions:
+        resolutions = [tuple(int(v) for v in r.split("x")) for r in args.resolutions]
+
+    results = run(args.stages, resolutions, args.repeat, args.model_dir)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved -> {args.baseline}")
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"\nNo baseline at {args.baseline}, run with --save-baseline first.")
+            sys.exit(2)
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
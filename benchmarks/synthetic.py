@@ -0,0 +1,32 @@
+import cv2
+import numpy as np
+
+WORD_CHARS = list("abcdefghijklmnopqrstuvwxyz")
+
+
+def render_text_page(height, width, angle=0.0, seed=0):
+    """Render a white page with random black words, rotated by angle degrees. Returns (gray_img, words)."""
+    rng = np.random.default_rng(seed)
+    img = np.full((height, width), 255, np.uint8)
+    scale = height / 1500
+    thickness = max(1, int(round(2 * scale)))
+    line_h = int(50 * scale)
+    margin = int(60 * scale)
+    words = []
+    y = margin + line_h
+    while y < height - margin:
+        x = margin
+        while True:
+            word = "".join(rng.choice(WORD_CHARS, rng.integers(3, 9)))
+            (tw, _), _ = cv2.getTextSize(word, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+            if x + tw > width - margin:
+                break
+            cv2.putText(img, word, (x, y), cv2.FONT_HERSHEY_SIMPLEX, scale, 0, thickness, cv2.LINE_AA)
+            words.append(word)
+            x += tw + int(20 * scale)
+        y += line_h
+    if angle:
+        M = cv2.getRotationMatrix2D((width // 2, height // 2), angle, 1.0)
+        img = cv2.warpAffine(img, M, (width, height), flags=cv2.INTER_LINEAR,
+                             borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+    return img, words
@@ -0,0 +1,98 @@
+"""
+Check the optimized CNN backends (cnn_engine) against the eager PyTorch model.
+
+    python -m benchmarks.verify_cnn_backend --images some/dir
+    python -m benchmarks.verify_cnn_backend --configs onnx:none onnx:dynamic onnx:static --calibration some/dir
+    python -m benchmarks.verify_cnn_backend --threads 2 --batch 16
+
+For every backend:quantization pair it reports the share of pages whose predicted class
+matches eager fp32, the largest logit difference, and latency per image (batch of 1) and
+per batch of --batch images. Without --images the synthetic corpus is used.
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+
+import cv2
+import torch
+from PIL import Image
+
+import cnn_engine
+import ml_model
+from benchmarks import corpus
+
+
+def load_tensors(folder):
+    if folder is None:
+        images = [img for _, img, _ in corpus.generate(resolutions=[(1200, 900)])]
+    else:
+        images = [cv2.imread(p) for p in sorted(glob.glob(os.path.join(folder, "*")))]
+        images = [img for img in images if img is not None]
+    return [ml_model._CNN_TRANSFORM(Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))) for img in images]
+
+
+def run(cnn, tensors, batch_size):
+    """(logits of every image, median seconds per single image, median seconds per batch)"""
+    single, logits = [], []
+    with torch.no_grad():
+        cnn(tensors[0].unsqueeze(0))  # warm-up
+        for tensor in tensors:
+            start = time.perf_counter()
+            logits.append(cnn(tensor.unsqueeze(0))[0])
+            single.append(time.perf_counter() - start)
+        batched = []
+        for i in range(0, len(tensors), batch_size):
+            batch = torch.stack(tensors[i:i + batch_size])
+            start = time.perf_counter()
+            cnn(batch)
+            batched.append(time.perf_counter() - start)
+    return torch.stack(logits), statistics.median(single), statistics.median(batched)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="folder of page photos")
+    parser.add_argument("--model-dir", default="models")
+    parser.add_argument("--configs", nargs="+", default=["torchscript:none", "torchscript:dynamic", "onnx:none", "onnx:dynamic"],
+                        help="backend:quantization pairs")
+    parser.add_argument("--calibration", help="calibration image folder for onnx:static")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--batch", type=int, default=8)
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.model_dir, "cnn_fold5.pth")):
+        print(f"cnn_fold5.pth not in {args.model_dir}")
+        return
+    if args.calibration:
+        cnn_engine.CNN_CALIBRATION_DIR = args.calibration
+    tensors = load_tensors(args.images)
+    if not tensors:
+        print("No images found.")
+        return
+
+    _, eager, _ = ml_model.load_models(args.model_dir, "torch", "none", args.threads)
+    eager = eager.cpu()
+    reference, ref_single, ref_batch = run(eager, tensors, args.batch)
+    ref_classes = reference.argmax(1)
+
+    print(f"{len(tensors)} image(s), batch {args.batch}, threads {args.threads or 'default'}\n")
+    print(f"{'backend':<22}{'agreement':>11}{'max |dlogit|':>14}{'ms/image':>10}{'ms/batch':>10}{'speedup':>9}")
+    print(f"{'torch:none (eager)':<22}{1:>11.1%}{0:>14.4f}{1000 * ref_single:>10.1f}{1000 * ref_batch:>10.1f}{1:>9.2f}")
+    for config in args.configs:
+        backend, quantization = config.split(":")
+        try:
+            _, cnn, _ = ml_model.load_models(args.model_dir, backend, quantization, args.threads)
+        except Exception as e:
+            print(f"{config:<22} failed: {e}")
+            continue
+        logits, single, batch = run(cnn, tensors, args.batch)
+        agreement = (logits.argmax(1) == ref_classes).float().mean().item()
+        diff = (logits - reference).abs().max().item()
+        print(f"{config:<22}{agreement:>11.1%}{diff:>14.4f}{1000 * single:>10.1f}{1000 * batch:>10.1f}"
+              f"{ref_single / single:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
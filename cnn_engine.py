@@ -0,0 +1,157 @@
+import glob
+import os
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+
+# --- CONFIG ---
+# CNN inference: "torch" (eager fp32), "torchscript" (traced and frozen) or "onnx" (ONNX Runtime)
+CNN_BACKEND = "torch"
+# "none", "dynamic" (int8 weights of the Linear/MatMul layers) or "static" (int8 convolutions
+# with calibrated activations, onnx only)
+CNN_QUANTIZATION = "none"
+# Page images used to calibrate static quantization
+CNN_CALIBRATION_DIR = None
+CNN_CALIBRATION_IMAGES = 64
+# Threads for CNN inference, 0 = library default (all cores)
+CNN_THREADS = 0
+
+_INPUT_SIZE = (1, 3, 224, 224)
+
+
+def _derived_path(weights_path, suffix):
+    return os.path.splitext(weights_path)[0] + suffix
+
+
+def _is_fresh(path, source):
+    """True if path exists and was built after source was last changed."""
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source)
+
+
+def export_onnx(model, weights_path):
+    """Export the eager model next to its weights (cnn_fold5.onnx), reused while the .pth is unchanged."""
+    onnx_path = _derived_path(weights_path, ".onnx")
+    if not _is_fresh(onnx_path, weights_path):
+        print(f"[CNN] Exporting {weights_path} -> {onnx_path}")
+        torch.onnx.export(model.cpu().eval(), (torch.zeros(_INPUT_SIZE),), onnx_path,
+                          input_names=["input"], output_names=["logits"],
+                          dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}}, opset_version=18)
+    return onnx_path
+
+
+class _CalibrationImages:
+    """onnxruntime CalibrationDataReader over page images, with the same transform as ml_model."""
+
+    def __init__(self, folder, transform, limit=CNN_CALIBRATION_IMAGES):
+        paths = sorted(p for p in glob.glob(os.path.join(folder, "*"))
+                       if os.path.splitext(p)[1].lower() in (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff"))
+        if not paths:
+            raise ValueError(f"No calibration images in {folder}")
+        self._paths = iter(paths[:limit])
+        self._transform = transform
+
+    def get_next(self):
+        for path in self._paths:
+            img = cv2.imread(path)
+            if img is not None:
+                tensor = self._transform(Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB)))
+                return {"input": tensor.unsqueeze(0).numpy()}
+        return None
+
+
+def quantize_onnx(onnx_path, mode, transform=None, calibration_dir=None):
+    """int8 copy of an exported model: "dynamic" (MatMul/Gemm weights) or "static" (calibrated, all convolutions)."""
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    out_path = _derived_path(onnx_path, f".int8-{mode}.onnx")
+    if _is_fresh(out_path, onnx_path):
+        return out_path
+    print(f"[CNN] Quantizing ({mode}) {onnx_path} -> {out_path}")
+    prepared = _derived_path(onnx_path, ".prep.onnx")
+    quant_pre_process(onnx_path, prepared)
+    try:
+        if mode == "dynamic":
+            # only the classifier's matrix multiplies: ONNX Runtime's dynamic ConvInteger kernels
+            # are slower than its fp32 convolutions, use "static" to get int8 convolutions
+            quantize_dynamic(prepared, out_path, weight_type=QuantType.QInt8, op_types_to_quantize=["MatMul", "Gemm"])
+        elif mode == "static":
+            calibration_dir = calibration_dir or CNN_CALIBRATION_DIR
+            if not calibration_dir:
+                raise ValueError("static quantization needs CNN_CALIBRATION_DIR")
+            quantize_static(prepared, out_path, _CalibrationImages(calibration_dir, transform),
+                            quant_format=QuantFormat.QDQ, per_channel=True,
+                            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+        else:
+            raise ValueError(f"Unknown quantization: {mode}")
+    finally:
+        os.remove(prepared)
+    return out_path
+
+
+class OnnxCNN:
+    """
+    ONNX Runtime session used in place of the torch model: called with an NCHW float
+    tensor, returns the logits as a tensor, so ml_model's prediction code is unchanged.
+    """
+
+    def __init__(self, onnx_path, threads=CNN_THREADS):
+        import onnxruntime as ort
+
+        sess_opts = ort.SessionOptions()
+        if threads:
+            sess_opts.intra_op_num_threads = threads
+        sess_opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.path = onnx_path
+        self.session = ort.InferenceSession(onnx_path, sess_opts, providers=["CPUExecutionProvider"])
+
+    def __call__(self, batch):
+        logits = self.session.run(None, {"input": batch.cpu().numpy().astype(np.float32, copy=False)})[0]
+        return torch.from_numpy(logits)
+
+    def eval(self):
+        return self
+
+
+def torchscript_model(model, weights_path, quantization="none"):
+    """Traced, frozen TorchScript module (cached next to the weights); "dynamic" quantizes the Linear layers."""
+    if quantization not in ("none", "dynamic"):
+        raise ValueError("torchscript supports quantization 'none' or 'dynamic', use the onnx backend for 'static'")
+    ts_path = _derived_path(weights_path, ".ts.pt" if quantization == "none" else ".int8-dynamic.ts.pt")
+    if _is_fresh(ts_path, weights_path):
+        return torch.jit.load(ts_path, map_location="cpu")
+    print(f"[CNN] Tracing {weights_path} -> {ts_path}")
+    model = model.cpu().eval()
+    if quantization == "dynamic":
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    with torch.no_grad():
+        traced = torch.jit.freeze(torch.jit.trace(model, torch.zeros(_INPUT_SIZE)))
+    traced.save(ts_path)
+    return traced
+
+
+def build_cnn(model, weights_path, backend=None, quantization=None, threads=None, transform=None):
+    """
+    The CNN to hand out from ml_model.load_models for the selected backend.
+    model is the loaded eager model; exported/quantized files are cached next to weights_path.
+    """
+    backend = backend or CNN_BACKEND
+    quantization = quantization or CNN_QUANTIZATION
+    threads = CNN_THREADS if threads is None else threads
+    if backend == "onnx":
+        onnx_path = export_onnx(model, weights_path)
+        if quantization != "none":
+            onnx_path = quantize_onnx(onnx_path, quantization, transform)
+        return OnnxCNN(onnx_path, threads)
+    if threads:
+        # process-wide for torch
+        torch.set_num_threads(threads)
+    if backend == "torchscript":
+        return torchscript_model(model, weights_path, quantization)
+    if backend == "torch":
+        if quantization != "none":
+            raise ValueError("the eager torch backend is fp32 only, pick torchscript or onnx to quantize")
+        return model
+    raise ValueError(f"Unknown CNN backend: {backend}")
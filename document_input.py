@@ -0,0 +1,125 @@
+"""
+Multi-page inputs (PDF, multi-page TIFF). Pages are decoded one at a time, so a long
+document is never held in memory whole; DocumentAssembler collects the finished pages
+into one image file, one text file and one audio file per document.
+"""
+import os
+
+import numpy as np
+from PIL import Image, TiffImagePlugin
+
+from tts_engine import join_audio
+
+# --- CONFIG ---
+# Resolution PDF pages are rendered at (scanned PDFs usually hold 200-300 dpi images)
+PDF_RENDER_DPI = 200
+DOCUMENT_MIME_TYPES = ("application/pdf", "image/tiff")
+DOCUMENT_EXTENSIONS = (".pdf", ".tif", ".tiff")
+DOCUMENT_DIR = os.path.join("downloads", "documents")
+
+
+def is_document(name, mime_type=None):
+    """PDFs and TIFFs go through the page-by-page path (a one-page TIFF is a one-page document)."""
+    if mime_type is not None and mime_type in DOCUMENT_MIME_TYPES:
+        return True
+    return os.path.splitext(name)[1].lower() in DOCUMENT_EXTENSIONS
+
+
+def _is_pdf(path):
+    with open(path, "rb") as f:
+        return f.read(5) == b"%PDF-"
+
+
+def page_count(path):
+    if _is_pdf(path):
+        import pypdfium2 as pdfium
+
+        pdf = pdfium.PdfDocument(path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    with Image.open(path) as im:
+        return getattr(im, "n_frames", 1)
+
+
+def iter_pages(path, pages=None, dpi=None):
+    """
+    (index, BGR image) for the pages of a PDF or TIFF, decoded on demand.
+    pages limits it to those indices (e.g. the ones not finished in an earlier run).
+    """
+    dpi = dpi or PDF_RENDER_DPI
+    if _is_pdf(path):
+        import pypdfium2 as pdfium
+
+        pdf = pdfium.PdfDocument(path)
+        try:
+            for index in range(len(pdf)):
+                if pages is not None and index not in pages:
+                    continue
+                page = pdf[index]
+                bitmap = page.render(scale=dpi / 72)
+                # pdfium renders BGR already; copy out of its buffer before it is freed
+                image = np.array(bitmap.to_numpy())
+                bitmap.close()
+                page.close()
+                yield index, image
+        finally:
+            pdf.close()
+    else:
+        with Image.open(path) as im:
+            for index in range(getattr(im, "n_frames", 1)):
+                if pages is not None and index not in pages:
+                    continue
+                im.seek(index)
+                yield index, np.asarray(im.convert("RGB"))[:, :, ::-1].copy()
+
+
+class DocumentAssembler:
+    """
+    Builds the per-document outputs while pages finish, in page order: processed pages
+    are appended to a multi-page TIFF and the text to one file as they arrive; the page
+    audio files are joined by close().
+    """
+
+    def __init__(self, base_name, out_dir=DOCUMENT_DIR):
+        os.makedirs(out_dir, exist_ok=True)
+        self.processed_path = os.path.join(out_dir, f"processed_{base_name}.tif")
+        self.text_file_path = os.path.join(out_dir, f"{base_name}.txt")
+        self.audio_base = os.path.join(out_dir, base_name)
+        self._tiff = TiffImagePlugin.AppendingTiffWriter(self.processed_path, True)
+        self._text = open(self.text_file_path, "w", encoding="utf-8")
+        self._audio = []
+        self.pages = 0
+
+    def add_page(self, index, processed_path, text_file_path, audio_path):
+        with Image.open(processed_path) as im:
+            im.save(self._tiff, compression="tiff_deflate")
+        self._tiff.newFrame()
+        with open(text_file_path, "r", encoding="utf-8") as f:
+            self._write_text(index, f.read().strip())
+        if audio_path:
+            self._audio.append(audio_path)
+        self.pages += 1
+
+    def missing_page(self, index, status):
+        """Note a page that was skipped (or deferred by the decision policy) in the text."""
+        self._write_text(index, f"[{status}]")
+
+    def _write_text(self, index, text):
+        if self._text.tell():
+            self._text.write("\n")
+        self._text.write(f"--- Page {index + 1} ---\n{text}\n")
+        self._text.flush()
+
+    def close(self):
+        """Finish the files; returns (processed_path, text_file_path, audio_path or None)."""
+        self._tiff.close()
+        self._text.close()
+        audio_path = None
+        if self._audio:
+            audio_path = join_audio(self._audio, self.audio_base + os.path.splitext(self._audio[0])[1])
+        if not self.pages:
+            os.remove(self.processed_path)
+            return None, self.text_file_path, audio_path
+        return self.processed_path, self.text_file_path, audio_path
@@ -2,40 +2,103 @@ from pydrive2.auth import GoogleAuth
 from pydrive2.drive import GoogleDrive
 import cv2, time, os
 import json
-from processing import remove_background, enhance_for_ocr_auto, pytesseract_ocr, text_to_speech
-from ml_model import load_models, process_for_ocr
-from gtts import gTTS 
+from processing import remove_background, remove_background_array, crop_to_page, enhance_for_ocr_auto, pytesseract_ocr, text_to_speech
 from playsound import playsound
 import threading
 import json
 import warnings
-from sklearn.exceptions import InconsistentVersionWarning
-
-warnings.filterwarnings("ignore", category=InconsistentVersionWarning)
-
-
-base_dir = "C:/Users/User/OneDrive/Desktop/SoundBookSoundJai_Project/models"
-rf_model, cnn_model, device = load_models(base_dir)
-
-# ----------------------------------------
-# -------------- Files setup -------------
-# ----------------------------------------
-
-def load_seen_files():
-    """Load processed file IDs from disk."""
-    if os.path.exists("processed_files.json"):
+from concurrent.futures import ThreadPoolExecutor
+from pipeline_executor import Stage, StagedExecutor
+from drive_transfer import DriveBackend, LocalFolderBackend
+from incremental_watch import IncrementalWatcher
+from job_store import JobStore
+from document_input import DocumentAssembler, is_document, iter_pages, page_count
+from playback_service import AudioStream, PlaybackService
+import processing
+import metrics
+from tts_engine import GTTSBackend, get_backend as get_tts_backend
+from result_cache import ContentCache, array_sha256, file_sha256, result_key, text_key, CACHE_DIR, TTS_CACHE_DIR
+
+# Folder with picture_detection_RF.pkl and cnn_fold5.pth, overridable with SOUNDBOOK_MODEL_DIR
+MODEL_DIR = os.environ.get("SOUNDBOOK_MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
+
+# The quality-gate models (and torch/sklearn behind them) are loaded on first use, or ahead
+# of it by warm_up(), so importing this module and starting the watcher is fast
+_models = None
+_models_lock = threading.Lock()
+
+def get_models():
+    """(rf_model, cnn_model, device), loaded from MODEL_DIR once."""
+    global _models
+    if _models is None:
+        with _models_lock:
+            if _models is None:
+                from sklearn.exceptions import InconsistentVersionWarning
+                from ml_model import load_models
+                warnings.filterwarnings("ignore", category=InconsistentVersionWarning)
+                start = time.perf_counter()
+                _models = load_models(MODEL_DIR)
+                print(f"[MODELS] Loaded from {MODEL_DIR} in {time.perf_counter() - start:.1f}s")
+    return _models
+
+def warm_up():
+    """Load the models and the configured engines in a background thread; returns the thread."""
+    # rembg is imported first and on this thread: when its pymatting/numba import happens
+    # on another thread, the interpreter hangs on exit
+    import rembg  # noqa: F401
+
+    def run():
         try:
-            with open("processed_files.json", "r") as f:
-                return set(json.load(f))
-        except:
-            return set()
-    return set()
-
+            get_models()
+            if processing.BG_REMOVAL_MODE == "pool":
+                processing.get_background_remover()
+            if processing.OCR_ENGINE == "tesserocr":
+                processing.get_ocr_pool()
+        except Exception as e:
+            # the first real use raises the error again
+            print(f"[WARMUP ERROR] {e}")
+    t = threading.Thread(target=run, daemon=True, name="warm-up")
+    t.start()
+    return t
 
-def save_seen_files(seen):
-    """Save processed file IDs to disk."""
-    with open("processed_files.json", "w") as f:
-        json.dump(list(seen), f)
+# pipeline_mode: "disk" (every stage writes a PNG and the next one re-reads it)
+# or "memory" (arrays are handed between stages, only uploaded artifacts are written)
+PIPELINE_MODE = "disk"
+# memory mode only: also write the background-removed image as a resume checkpoint
+# (one more full-size PNG encode per file; without it a file interrupted after
+# background removal redoes that stage on resume)
+MEMORY_CHECKPOINTS = False
+# Background writer for artifacts that get uploaded (memory mode)
+_artifact_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="artifact-writer")
+
+# executor_mode: "sequential" (one file at a time) or "pipelined" (StagedExecutor, files overlap across stages)
+EXECUTOR_MODE = "sequential"
+# Worker threads per stage in pipelined mode
+STAGE_WORKERS = {
+    "download": 4,
+    "quality_gate": 1,
+    "remove_background": 2,
+    "enhance": 4,
+    "ocr": 4,
+    "tts": 4,
+    "upload": 4,
+}
+# Max files waiting in front of each stage
+STAGE_QUEUE_SIZE = 4
+
+# transfer_backend: "drive" (Google Drive) or "local" (folders under LOCAL_DRIVE_ROOT, for offline runs/tests)
+TRANSFER_BACKEND = "drive"
+LOCAL_DRIVE_ROOT = "local_drive"
+
+# Content-addressed caches: stage outputs keyed by image hash, and TTS audio keyed by text
+USE_RESULT_CACHE = False
+USE_TTS_CACHE = False
+
+# watch_mode: "full" (list the whole input folder every poll) or
+# "incremental" (only files added or changed since the cursor saved in watch_cursor.json:
+# Drive's changes feed; the local backend uses a modifiedDate cursor plus a periodic full
+# listing, see incremental_watch.FULL_LISTING_EVERY)
+WATCH_MODE = "full"
 
 # ----------------------------------------
 # ---------- Google Drive setup ----------
@@ -53,93 +116,591 @@ def connect_drive():
     gauth.SaveCredentialsFile("credentials.json")
     return GoogleDrive(gauth)
 
-def get_folder_files(drive, folder_id):
-    return drive.ListFile({'q': f"'{folder_id}' in parents and trashed=false"}).GetList()
-
-def upload_file_to_drive(drive, file_path, folder_id):
-    file_name = os.path.basename(file_path)
-    gfile = drive.CreateFile({'title': file_name, 'parents': [{'id': folder_id}]})
-    gfile.SetContentFile(file_path)
-    gfile.Upload()
-    print(f"[Drive] Uploaded: {file_name}")
+def connect_transfer():
+    """TransferBackend selected by TRANSFER_BACKEND."""
+    if TRANSFER_BACKEND == "local":
+        return LocalFolderBackend(LOCAL_DRIVE_ROOT)
+    return DriveBackend(connect_drive())
 
 # --------------------------------------
 # ---------- Image Processing ----------
 # --------------------------------------
 
-def process_image_file(local_path, drive, output_folder_id, text_folder_id, audio_folder_id):
-    print(f"[INFO] Processing {local_path}")
-
-    # Ensure local folders exist
-    os.makedirs("downloads/bg_removed", exist_ok=True)
-    os.makedirs("downloads/processed", exist_ok=True)
-    os.makedirs("downloads/text", exist_ok=True)
-    os.makedirs("downloads/audio", exist_ok=True)
-
+def _write_image(path, img):
+    # write next to the target and rename, so a crash never leaves a half-written checkpoint
+    base, ext = os.path.splitext(path)
+    tmp_path = f"{base}.tmp{ext}"
+    if not cv2.imwrite(tmp_path, img):
+        raise IOError(f"Could not write {path}")
+    os.replace(tmp_path, path)
+    return path
+
+def _write_checkpoint(path, img, cache_key=None):
+    # the cache gets a copy of the written file instead of a second encode
+    _write_image(path, img)
+    if cache_key is not None:
+        _get_cache(CACHE_DIR).put_file(cache_key, "bg_removed.png", path)
+    return path
+
+def _write_text(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+# Each stage takes the per-file job dict, fills in its outputs and returns it.
+# A stage sets job["status"] to end processing of that file early.
+# With a JobStore attached, every finished stage is checkpointed (see run_stage / restore_job).
+
+def new_job(local_path, transfer, output_folder_id, text_folder_id, audio_folder_id,
+            pipeline_mode=None, ml_result=None, drive_file=None, store=None):
     filename = os.path.basename(local_path)
-    base_name, _ = os.path.splitext(filename)
-    bg_removed_path = os.path.join("downloads", "bg_removed", f"bg_removed_{base_name}.png")
+    return {
+        "file_id": drive_file["id"] if drive_file is not None else None,
+        "store": store,
+        "done_stages": set(),
+        "stage": None,
+        "image": None,
+        "local_path": local_path,
+        "filename": filename,
+        "base_name": os.path.splitext(filename)[0],
+        "transfer": transfer,
+        "drive_file": drive_file,
+        "folders": {"output": output_folder_id, "text": text_folder_id, "audio": audio_folder_id},
+        "pipeline_mode": pipeline_mode or PIPELINE_MODE,
+        "ml_result": ml_result,
+        "status": None,
+        "audio_path": None,
+    }
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def _get_cache(root):
+    with _caches_lock:
+        if root not in _caches:
+            _caches[root] = ContentCache(root)
+    return _caches[root]
+
+def _result_settings():
+    """The settings the cached verdict, pixels, text and audio depend on."""
+    import ml_model, cnn_engine, background_removal, ocr_engine, tts_engine
+    return (
+        ("gate", ml_model.GATE_MODE, ml_model.CASCADE_BAND, ml_model.CASCADE_MAX_SIDE,
+         cnn_engine.CNN_BACKEND, cnn_engine.CNN_QUANTIZATION),
+        ("background", processing.BG_REMOVAL_MODE, background_removal.REMBG_MODEL, background_removal.REMBG_MAX_SIDE),
+        ("crop", processing.PAGE_CROP_MODE, processing.PAGE_CROP_MARGIN, processing.PAGE_MIN_AREA),
+        ("scale", processing.TEXT_SCALE_MODE, processing.TEXT_X_HEIGHT, processing.TEXT_SCALE_LIMITS,
+         processing.TEXT_SCALE_TOLERANCE),
+        ("enhance", processing.ENHANCE_MODE, processing.DESKEW_MODE),
+        ("ocr", processing.OCR_ENGINE, processing.OCR_PARALLEL_BLOCKS, ocr_engine.OCR_LANG, ocr_engine.OCR_PSM),
+        ("tts", processing.TTS_CHUNKED, tts_engine.TTS_BACKEND, tts_engine.ESPEAK_VOICE, tts_engine.ESPEAK_SPEED),
+    )
+
+def _result_cache_key(job):
+    """
+    Cache key of the input file when the result cache is on, else None: its content hash
+    combined with _result_settings(), so a changed setting misses the cache.
+    """
+    if not USE_RESULT_CACHE:
+        return None
+    if "cache_key" not in job:
+        # a document page in memory mode has no file, its pixels were hashed when it was decoded
+        content_hash = job.get("page_hash") or file_sha256(job["local_path"])
+        job["cache_key"] = result_key(content_hash, _result_settings())
+    return job["cache_key"]
+
+def _restore_from_cache(job, key):
+    """Serve a duplicate upload from the cache: copy the final artifacts and skip to the upload."""
+    cache = _get_cache(CACHE_DIR)
+    if not cache.has(key, "processed.png", "text.txt"):
+        return False
+    audio_name = next((n for n in ("audio.mp3", "audio.wav") if cache.get(key, n) is not None), None)
+    if audio_name is None and cache.get(key, "no_audio") is None:
+        return False
+    for folder in ("processed", "text", "audio"):
+        os.makedirs(os.path.join("downloads", folder), exist_ok=True)
+    paths = {
+        "processed.png": os.path.join("downloads", "processed", f"processed_{job['base_name']}.png"),
+        "text.txt": os.path.join("downloads", "text", f"{job['base_name']}.txt"),
+    }
+    if audio_name is not None:
+        paths[audio_name] = os.path.join("downloads", "audio", job["base_name"] + os.path.splitext(audio_name)[1])
+    # one step, so an eviction in between can't leave a partial set
+    if not cache.copy_all(key, paths):
+        return False  # evicted in the meantime
+    job["processed_path"] = paths["processed.png"]
+    job["text_file_path"] = paths["text.txt"]
+    job["audio_path"] = paths.get(audio_name)
+    job["ml_result"] = (None, False)
+    job["from_cache"] = True
+    job["done_stages"].update(["remove_background", "enhance", "ocr", "tts"])
+    print(f"[CACHE] {job['filename']} is a duplicate of an earlier upload, re-uploading cached results.")
+    return True
+
+def stage_download(job):
+    print(f"[NEW] {job['filename']}")
+    job["transfer"].download(job["drive_file"], job["local_path"])
+    return job
+
+def stage_quality_gate(job):
+    print(f"[INFO] Processing {job['local_path']} ({job['pipeline_mode']} mode)")
+
+    key = _result_cache_key(job)
+    if key is not None:
+        if _restore_from_cache(job, key):
+            return job
+        verdict = _get_cache(CACHE_DIR).get_text(key, "verdict")
+        if verdict is not None and job["ml_result"] is None:
+            print(f"[CACHE] Quality verdict: {verdict}")
+            job["ml_result"] = (None, verdict == "bad")
 
     # ML quality check: returns image and bad_quality flag
-    img_read, bad_quality = process_for_ocr(local_path, rf_model, cnn_model, device)
-
-    # If ML suspects bad quality, ask user to continue or skip
-    if bad_quality:
+    # (ml_result is passed in when the whole poll batch was already checked)
+    if job["ml_result"] is None and job["image"] is not None:
+        # a document page, decoded from the document and never written
+        from ml_model import process_for_ocr_image
+        job["ml_result"] = process_for_ocr_image(job["image"], job["filename"], *get_models())
+    elif job["ml_result"] is None:
+        from ml_model import process_for_ocr
+        job["ml_result"] = process_for_ocr(job["local_path"], *get_models())
+    image, bad_quality = job["ml_result"]
+    if image is not None:
+        job["image"] = image
+    if key is not None:
+        _get_cache(CACHE_DIR).put_text(key, "verdict", "bad" if bad_quality else "ok")
+
+    # If ML suspects bad quality, apply DECISION_POLICY (or ask the user in "prompt" mode)
+    if bad_quality and DECISION_POLICY != "prompt":
+        reason = "embedded images or poor quality"
+        if DECISION_POLICY == "continue":
+            print(f"[DECISION] {job['filename']}: {reason}, continuing (policy).")
+        elif DECISION_POLICY == "skip":
+            print(f"[DECISION] {job['filename']}: {reason}, skipped (policy).")
+            job["status"] = "skipped"
+        elif DECISION_POLICY == "defer":
+            print(f"[DECISION] {job['filename']}: {reason}, deferred to the review queue.")
+            job["status"] = "deferred"
+            job["review_reason"] = reason
+        else:
+            raise ValueError(f"Unknown decision policy: {DECISION_POLICY}")
+    elif bad_quality:
         while True:
-            resp = input(f"[DECISION] {filename} appears to have embedded images or poor quality. Continue processing? (y = continue / s = skip): ").strip().lower()
+            resp = input(f"[DECISION] {job['filename']} appears to have embedded images or poor quality. Continue processing? (y = continue / s = skip): ").strip().lower()
             if resp in ("y", "yes"):
                 print("[DECISION] User chose to continue processing.")
                 break
             elif resp in ("s", "skip", "n", "no"):
                 print("[DECISION] User chose to skip this file.")
-                return {"status": "skipped", "audio_path": None}
+                job["status"] = "skipped"
+                break
             else:
                 print("Please enter 'y' to continue or 's' to skip.")
+    return job
+
+def stage_remove_background(job):
+    key = _result_cache_key(job)
+    cached = _get_cache(CACHE_DIR).get(key, "bg_removed.png") if key is not None else None
+    if cached is not None:
+        print("[CACHE] Background-removed image found")
+        job["image"] = cv2.imread(cached)
+        if job["image"] is not None:
+            job["bg_removed_path"] = cached
+            return job
+
+    if job["pipeline_mode"] == "memory":
+        if job["image"] is None:
+            # resumed after the quality gate, or gated in a poll batch (which keeps no pixels)
+            job["image"] = cv2.imread(job["local_path"])
+        if job["image"] is None:
+            print("[WARN] Could not decode input image.")
+            job["status"] = "error"
+            return job
+        img = remove_background_array(job["image"])
+        print("[INFO] Background removed (in memory)")
+        if MEMORY_CHECKPOINTS and job["store"] is not None and img is not None:
+            # checkpoint for resume; the stage is only restored if the file made it to disk
+            os.makedirs("downloads/bg_removed", exist_ok=True)
+            job["bg_removed_path"] = os.path.join("downloads", "bg_removed", f"bg_removed_{job['base_name']}.png")
+            _artifact_writer.submit(_write_checkpoint, job["bg_removed_path"], img, key)
+        elif key is not None and img is not None:
+            _artifact_writer.submit(_get_cache(CACHE_DIR).put_image, key, "bg_removed.png", img)
+    else:
+        os.makedirs("downloads/bg_removed", exist_ok=True)
+        bg_removed_path = os.path.join("downloads", "bg_removed", f"bg_removed_{job['base_name']}.png")
+        bg_removed_path = remove_background(job["local_path"], bg_removed_path)
+        print(f"[INFO] Background removed -> {bg_removed_path}")
+        job["bg_removed_path"] = bg_removed_path
+        img = cv2.imread(bg_removed_path)
+        if key is not None and img is not None:
+            _get_cache(CACHE_DIR).put_file(key, "bg_removed.png", bg_removed_path)
 
-    # Remove image background
-    bg_removed_path = remove_background(local_path, bg_removed_path)
-    print(f"[INFO] Background removed -> {bg_removed_path}")
-
-    # Enhance image
-    img = cv2.imread(bg_removed_path)
     if img is None:
         print("[WARN] Could not load background-removed image.")
-        return
+        job["status"] = "error"
+    job["image"] = img
+    return job
 
-    processed = enhance_for_ocr_auto(img)
-    processed_path = os.path.join("downloads", "processed", f"processed_{base_name}.png")
-    cv2.imwrite(processed_path, processed)
-    print(f"[DONE] Enhanced image saved -> {processed_path}")
+def stage_enhance(job):
+    os.makedirs("downloads/processed", exist_ok=True)
+    if job["image"] is None:
+        job["image"] = cv2.imread(job["bg_removed_path"])
+        if job["image"] is None:
+            raise IOError(f"Could not load checkpoint {job['bg_removed_path']}")
+    # only the page region goes on to enhancement, deskew and OCR (processing.PAGE_CROP_MODE)
+    processed = enhance_for_ocr_auto(crop_to_page(job["image"]))
+    processed_path = os.path.join("downloads", "processed", f"processed_{job['base_name']}.png")
+    job["processed_path"] = processed_path
+    if job["pipeline_mode"] == "memory":
+        # written in the background, only needed for the upload
+        job["processed_write"] = _artifact_writer.submit(_write_image, processed_path, processed)
+        job["image"] = processed
+    else:
+        cv2.imwrite(processed_path, processed)
+        print(f"[DONE] Enhanced image saved -> {processed_path}")
+        job["image"] = cv2.imread(processed_path)
+    return job
 
-    # OCR
-    processed_img = cv2.imread(processed_path)
+def stage_ocr(job):
+    os.makedirs("downloads/text", exist_ok=True)
     text = ""
-    if processed_img is not None:
-        text = pytesseract_ocr(processed_img)
-        text_file_path = os.path.join("downloads", "text", f"{base_name}.txt")
-        with open(text_file_path, "w", encoding="utf-8") as f:
-            f.write(text.strip())
-        print(f"[OCR] Extracted text saved -> {text_file_path}")
+    text_file_path = os.path.join("downloads", "text", f"{job['base_name']}.txt")
+    if job["image"] is None and "processed_write" not in job:
+        job["image"] = cv2.imread(job["processed_path"])
+    if job["image"] is not None:
+        text = pytesseract_ocr(job["image"])
     else:
         print("[WARN] Could not read processed image for OCR.")
-        text_file_path = os.path.join("downloads", "text", f"{base_name}.txt")
-        with open(text_file_path, "w", encoding="utf-8") as f:
-            f.write("")
-
-    clean_text = text.replace("\n", " ").strip()
-
-    # Text to Speech
-    audio_path = text_to_speech(clean_text, base_name)
-
-    # Upload processed image back to Drive
-    upload_file_to_drive(drive, processed_path, output_folder_id)
-    upload_file_to_drive(drive, text_file_path, text_folder_id)
-    if audio_path is not None:
-        upload_file_to_drive(drive, audio_path, audio_folder_id)
+    if job["pipeline_mode"] == "memory":
+        job["text_write"] = _artifact_writer.submit(_write_text, text_file_path, text.strip())
+    else:
+        _write_text(text_file_path, text.strip())
+        print(f"[OCR] Extracted text saved -> {text_file_path}")
+    job["text_file_path"] = text_file_path
+    job["text"] = text
+    job["image"] = None  # nothing downstream needs the pixels
+    return job
+
+def stage_tts(job):
+    if "text" not in job:
+        with open(job["text_file_path"], "r", encoding="utf-8") as f:
+            job["text"] = f.read()
+    clean_text = job["text"].replace("\n", " ").strip()
+    if USE_TTS_CACHE and clean_text:
+        # streaming always synthesizes through tts_engine's chunked path
+        backend = get_tts_backend() if processing.TTS_CHUNKED or job.get("audio_stream") else GTTSBackend()
+        tts_key = text_key(clean_text, *backend.settings())
+        audio_name = "audio" + backend.extension
+        os.makedirs("downloads/audio", exist_ok=True)
+        audio_path = os.path.join("downloads", "audio", f"{job['base_name']}{backend.extension}")
+        if _get_cache(TTS_CACHE_DIR).copy_to(tts_key, audio_name, audio_path):
+            print(f"[CACHE] Audio for identical text reused -> {audio_path}")
+            job["audio_path"] = audio_path
+            return job
+    stream = job.get("audio_stream")
+    on_chunk = None
+    if stream is not None:
+        # sentence chunks go to the player while the rest of the page is still synthesized
+        on_chunk = lambda path: stream.chunk(job["stream_index"], path)
+    job["audio_path"] = text_to_speech(clean_text, job["base_name"], on_chunk=on_chunk)
+    if stream is not None:
+        job["streamed"] = job["audio_path"] is not None
+        stream.done(job["stream_index"])
+    if USE_TTS_CACHE and job["audio_path"] is not None:
+        _get_cache(TTS_CACHE_DIR).put_file(tts_key, audio_name, job["audio_path"])
+    return job
+
+def stage_upload(job):
+    # surface write errors before uploading; either write may be missing when its stage
+    # was restored from a checkpoint
+    if job.get("processed_write") is not None:
+        job["processed_write"].result()
+        print(f"[DONE] Enhanced image saved -> {job['processed_path']}")
+    if job.get("text_write") is not None:
+        job["text_write"].result()
+        print(f"[OCR] Extracted text saved -> {job['text_file_path']}")
+
+    key = _result_cache_key(job)
+    if key is not None and not job.get("from_cache"):
+        cache = _get_cache(CACHE_DIR)
+        cache.put_file(key, "processed.png", job["processed_path"])
+        cache.put_file(key, "text.txt", job["text_file_path"])
+        if job["audio_path"] is not None:
+            cache.put_file(key, "audio" + os.path.splitext(job["audio_path"])[1], job["audio_path"])
+        else:
+            cache.put_text(key, "no_audio", "")
+
+    # Upload processed image, text and audio back to Drive (concurrently)
+    folders = job["folders"]
+    uploads = [(job["processed_path"], folders["output"]), (job["text_file_path"], folders["text"])]
+    if job["audio_path"] is not None:
+        uploads.append((job["audio_path"], folders["audio"]))
+    job["transfer"].upload_many(uploads)
     print(f"[UPLOAD] Processed image uploaded to Drive ✅")
     print(f"----------------------------------------------")
+    job["status"] = "processed"
+    return job
+
+PROCESSING_STAGES = [
+    ("quality_gate", stage_quality_gate),
+    ("remove_background", stage_remove_background),
+    ("enhance", stage_enhance),
+    ("ocr", stage_ocr),
+    ("tts", stage_tts),
+    ("upload", stage_upload),
+]
+
+STAGE_NAMES = ["download"] + [name for name, _ in PROCESSING_STAGES]
+
+def _stage_artifact(name, job):
+    """What a stage checkpoint records: the path of the file it produced, or the gate verdict."""
+    if name == "download":
+        return job["local_path"]
+    if name == "quality_gate":
+        return "bad" if job["ml_result"][1] else "ok"
+    if name == "remove_background":
+        return job.get("bg_removed_path")
+    if name == "enhance":
+        return job["processed_path"]
+    if name == "ocr":
+        return job["text_file_path"]
+    if name == "tts":
+        return job["audio_path"]
+    return None
+
+def approve_gate(job):
+    """Treat the quality gate as passed without running it."""
+    job["done_stages"].add("quality_gate")
+    job["ml_result"] = (None, False)
+    return job
+
+def restore_job(job, checkpoints):
+    """
+    Mark the stages finished in an earlier run as done, up to the first one whose
+    checkpoint is missing or whose artifact no longer exists on disk.
+    """
+    for name in STAGE_NAMES:
+        if name not in checkpoints:
+            break
+        artifact = checkpoints[name]
+        # the gate verdict is not a file, and TTS legitimately records no file for empty text
+        file_expected = name != "quality_gate" and (artifact or name != "tts")
+        if file_expected and not (artifact and os.path.exists(artifact)):
+            break
+        job["done_stages"].add(name)
+        if name == "quality_gate":
+            job["ml_result"] = (None, artifact == "bad")
+        elif name == "remove_background":
+            job["bg_removed_path"] = artifact
+        elif name == "enhance":
+            job["processed_path"] = artifact
+        elif name == "ocr":
+            job["text_file_path"] = artifact
+        elif name == "tts":
+            job["audio_path"] = artifact or None
+    if checkpoints.get("review") == "approved":
+        # passed by a reviewer: the gate is not run again, even when the stages before it
+        # (e.g. the download) have to be redone
+        approve_gate(job)
+    if job["done_stages"]:
+        print(f"[RESUME] {job['filename']}: skipping finished stages {sorted(job['done_stages'])}")
+    return job
+
+def run_stage(job, name, stage):
+    """Run one stage unless it was restored from a checkpoint, then checkpoint it."""
+    if name in job["done_stages"]:
+        return job
+    job["stage"] = name
+    token = metrics.current_file.set(job["filename"])
+    try:
+        with metrics.profiler_for(job["filename"]), \
+                metrics.stage_timer(name, image=job["image"], queue_wait=job.pop("queue_wait", None)) as rec:
+            job = stage(job)
+            rec["status"] = job["status"]
+            if "width" not in rec and job["image"] is not None:
+                rec["height"], rec["width"] = job["image"].shape[:2]
+    finally:
+        metrics.current_file.reset(token)
+    if job["store"] is not None and job["status"] in (None, "processed"):
+        job["store"].checkpoint(job["file_id"], name, _stage_artifact(name, job))
+    job["done_stages"].add(name)
+    return job
+
+def run_job(job):
+    for name, stage in PROCESSING_STAGES:
+        if job["status"] is not None:
+            break
+        job = run_stage(job, name, stage)
+    return job
+
+def job_result(job):
+    # streamed: the audio was already handed to the player chunk by chunk
+    return {"status": job["status"] or "error", "audio_path": job["audio_path"], "streamed": job.get("streamed", False)}
+
+def record_result(store, job, error=None):
+    """Store the outcome of a job; errors are scheduled for a retry from the failed stage."""
+    res = job_result(job)
+    if error is not None or res["status"] == "error":
+        store.fail(job["file_id"], job["stage"], error or "stage reported an error")
+        return {"status": "error", "audio_path": None}
+    if res["status"] == "deferred":
+        store.defer(job["file_id"], job.get("review_reason"))
+        return res
+    store.finish(job["file_id"], res["status"])
+    return res
+
+def process_image_file(local_path, transfer, output_folder_id, text_folder_id, audio_folder_id, pipeline_mode=None, ml_result=None):
+    job = new_job(local_path, transfer, output_folder_id, text_folder_id, audio_folder_id,
+                  pipeline_mode=pipeline_mode, ml_result=ml_result)
+    return job_result(run_job(job))
+
+def _page_jobs(job, n_pages, restored, approved=(), stream=None):
+    """
+    One job per page of a downloaded document, decoded only when the pipeline asks for the
+    next page. Pages finished in an earlier run (restored: {index: outputs}) are not decoded again;
+    approved pages (deferred, then passed by a reviewer) skip the quality gate.
+    The decoded page travels in the job; it is only written to downloads/pages in disk mode,
+    whose background removal reads its input from a file.
+    """
+    if job["pipeline_mode"] == "disk":
+        os.makedirs(os.path.join("downloads", "pages"), exist_ok=True)
+    todo = set(range(n_pages)) - set(restored)
+    decoded = iter_pages(job["local_path"], pages=todo)
+    for index in range(n_pages):
+        page_path = os.path.join("downloads", "pages", f"{job['base_name']}_p{index + 1:04d}.png")
+        folders = job["folders"]
+        page = new_job(page_path, job["transfer"], folders["output"], folders["text"], folders["audio"],
+                       pipeline_mode=job["pipeline_mode"])
+        page["page_index"] = index
+        page["done_stages"].add("download")
+        if stream is not None:
+            page.update(audio_stream=stream, stream_index=index)
+        if index in approved:
+            approve_gate(page)
+        if index in restored:
+            page.update(restored[index], status="processed")
+        else:
+            _, page["image"] = next(decoded)
+            if job["pipeline_mode"] == "disk":
+                _write_image(page_path, page["image"])
+            elif USE_RESULT_CACHE:
+                page["page_hash"] = array_sha256(page["image"])
+        yield page
+
+def _run_pages(pages):
+    """Sequential counterpart of StagedExecutor.run: (page, error) per page, in order."""
+    try:
+        for page in pages:
+            try:
+                yield run_job(page), None
+            except Exception as e:
+                yield page, e
+    except Exception as e:
+        # decoding the next page failed
+        yield None, e
 
-    return {"status": "processed", "audio_path": audio_path}
+def process_document(job, player=None):
+    """
+    Process a downloaded PDF / multi-page TIFF page by page. Each page goes through
+    PROCESSING_STAGES as soon as it is decoded (overlapping with the next pages in
+    pipelined mode) and its text and audio are uploaded when ready; the combined
+    document outputs are uploaded at the end. Finished pages are checkpointed, so a
+    retry continues after the last one.
+    Pages the decision policy defers put the whole document in the review queue (with the
+    page numbers as reason); once approved, only those pages are processed, without the gate.
+    """
+    store = job["store"]
+    checkpoints = store.checkpoints(job["file_id"]) if store is not None else {}
+    restored, approved = {}, set()
+    for name, artifact in checkpoints.items():
+        if name.startswith("page:"):
+            outputs = json.loads(artifact)
+            if all(p is None or os.path.exists(p) for p in outputs.values()):
+                restored[int(name[5:]) - 1] = outputs
+        elif name.startswith("deferred:") and checkpoints.get("review") == "approved":
+            approved.add(int(name[9:]) - 1)
+    if restored:
+        print(f"[RESUME] {job['filename']}: {len(restored)} page(s) already done")
+
+    # a document that cannot be opened fails here, as a plain job error
+    job["stage"] = "open document"
+    n_pages = page_count(job["local_path"])
+    stream = audio_stream(player)
+    pages = _page_jobs(job, n_pages, restored, approved, stream)
+    results = build_executor().run(pages) if EXECUTOR_MODE == "pipelined" else _run_pages(pages)
+
+    assembler = DocumentAssembler(job["base_name"])
+    outputs = {"processed_path": None, "text_file_path": None, "audio_path": None}
+    failed, deferred = None, {}
+    try:
+        for page, error in results:
+            if page is None:
+                # a page could not be decoded; the ones after it are not reached
+                print(f"[ERROR] {job['filename']}: reading pages failed: {error}")
+                failed = failed or ("read pages", error)
+                continue
+            index = page["page_index"]
+            if stream is not None:
+                stream.done(index)
+            if error is None and page["status"] in (None, "error"):
+                error = RuntimeError(f"stage '{page['stage']}' reported an error")
+            if error is not None:
+                # later pages still finish and are checkpointed, the retry only redoes this one
+                print(f"[ERROR] {job['filename']}: page {index + 1} failed: {error}")
+                failed = failed or (f"page {index + 1}", error)
+                continue
+            if page["status"] != "processed":
+                print(f"[DOC] {job['filename']}: page {index + 1} {page['status']}")
+                if page["status"] == "deferred":
+                    deferred[index] = page.get("review_reason")
+                    if store is not None:
+                        store.checkpoint(job["file_id"], f"deferred:{index + 1:04d}", page.get("review_reason"))
+                if failed is None:
+                    assembler.missing_page(index, page["status"])
+                continue
+            outputs = {k: page[k] for k in ("processed_path", "text_file_path", "audio_path")}
+            if index not in restored:
+                if store is not None:
+                    store.checkpoint(job["file_id"], f"page:{index + 1:04d}", json.dumps(outputs))
+                if player is not None and page["audio_path"] and not page.get("streamed"):
+                    # the first pages are read aloud while later ones are still being processed
+                    player.enqueue([page["audio_path"]])
+            if failed is None:
+                assembler.add_page(index, **outputs)
+    finally:
+        processed_path, text_file_path, audio_path = assembler.close()
+    if failed is not None:
+        job["stage"] = failed[0]
+        raise failed[1]
+    if deferred:
+        # the finished pages are uploaded and checkpointed; the document waits for the review
+        reason = "; ".join(f"page {index + 1}: {reason}" for index, reason in sorted(deferred.items()))
+        print(f"[DECISION] {job['filename']}: {len(deferred)} page(s) deferred to the review queue.")
+        job.update(pages=assembler.pages, status="deferred", review_reason=reason, audio_path=None)
+        return job
+
+    if assembler.pages > 1:
+        folders = job["folders"]
+        uploads = [(processed_path, folders["output"]), (text_file_path, folders["text"])]
+        if audio_path is not None:
+            uploads.append((audio_path, folders["audio"]))
+        job["transfer"].upload_many(uploads)
+        print(f"[DOC] {job['filename']}: {assembler.pages} pages assembled and uploaded ✅")
+        outputs = {"processed_path": processed_path, "text_file_path": text_file_path, "audio_path": audio_path}
+    # a one-page document's outputs are those of its page
+    job.update(outputs, pages=assembler.pages, status="processed")
+    if player is not None:
+        # the pages are already queued one by one
+        job["audio_path"] = None
+    return job
+
+def build_executor():
+    """StagedExecutor over download + PROCESSING_STAGES with STAGE_WORKERS threads per stage."""
+    stages = [("download", stage_download)] + PROCESSING_STAGES
+    stages = [Stage(name, lambda job, name=name, fn=fn: run_stage(job, name, fn), STAGE_WORKERS.get(name, 1))
+              for name, fn in stages]
+    return StagedExecutor(stages, queue_size=STAGE_QUEUE_SIZE,
+                          should_stop=lambda job: job["status"] is not None,
+                          on_dequeue=lambda name, job, waited: job.__setitem__("queue_wait", waited))
 
 
 # ----------------------------------------
@@ -148,10 +709,30 @@ def process_image_file(local_path, drive, output_folder_id, text_folder_id, audi
 
 # play_mode: "immediate", "batch", or "prompt"
 PLAY_MODE = "prompt"
+# What happens where the watcher would otherwise wait on input():
+#   "prompt"   ask at the console (blocks the pipeline until someone answers)
+#   "continue" flagged pages are processed; prompted audio is played
+#   "skip"     flagged pages are skipped; prompted audio is not played
+#   "defer"    flagged pages go to the review queue (python review_queue.py) and the
+#              pipeline moves on; prompted audio is saved to the audio queue
+DECISION_POLICY = "prompt"
 # For prompt mode, auto-decide after timeout_seconds if user doesn't reply
 PROMPT_TIMEOUT_SECONDS = 100
 # Use 'playsound' or 'pydub' backend. If playsound not installed, pip install playsound
 PLAYBACK_BACKEND = "playsound"
+# "inline": audio plays on the watcher loop, which waits for it (queue in audio_queue.json)
+# "service": playback_service plays on its own thread with a persistent priority queue;
+#            the watcher keeps polling and processing meanwhile
+PLAYBACK_MODE = "inline"
+# Service playback with PLAY_MODE = "immediate" only: each page's audio is queued sentence
+# chunk by chunk while TTS is still running, so reading starts before the page is synthesized
+STREAM_AUDIO = False
+
+def audio_stream(player):
+    """AudioStream feeding the playback service when STREAM_AUDIO applies, else None."""
+    if STREAM_AUDIO and player is not None and PLAY_MODE == "immediate":
+        return AudioStream(player)
+    return None
 
 def play_audio_blocking(path):
     try:
@@ -196,6 +777,22 @@ def play_queued_audios(queue_file="audio_queue.json"):
     with open(queue_file, "w", encoding="utf-8") as f:
         json.dump([], f)
 
+def play_audios(paths, player=None):
+    """Play now: inline (blocking) or handed to the playback service."""
+    if player is not None:
+        player.enqueue(paths)
+        return
+    for ap in paths:
+        print(f"[AUDIO] Playing {ap}")
+        play_audio_blocking(ap)
+
+def queue_audios(paths, player=None):
+    """Keep for later playback (prompt_play_queue / python playback_service.py play-held)."""
+    if player is not None:
+        player.enqueue(paths, held=True)
+    else:
+        save_audio_queue(paths)
+
 
 # ----------------------------------------
 # ------------- Main Watcher -------------
@@ -203,106 +800,200 @@ def play_queued_audios(queue_file="audio_queue.json"):
 
 def watch_drive_folder(input_folder_id, output_folder_id, text_folder_id, audio_folder_id, poll_interval=10):
     
-    drive = connect_drive()
-    seen = load_seen_files()
+    # models load while Drive authenticates and the first poll runs
+    warm_up()
+    transfer = connect_transfer()
+    watcher = IncrementalWatcher(transfer, input_folder_id) if WATCH_MODE == "incremental" else None
+    store = JobStore()
+    store.import_seen_files()
     os.makedirs("downloads", exist_ok=True)
+    metrics.start_metrics_server()
+    player = PlaybackService().start() if PLAYBACK_MODE == "service" else None
 
     print(f"👁 Watching Google Drive folder ID: {input_folder_id}")
     while True:
         try:
-            files = get_folder_files(drive, input_folder_id)
-            # collect new image files in this poll
-            new_image_files = []
-            for f in files:
-                if f['id'] in seen:
-                    continue
-                if f['mimeType'].startswith('image/'):
-                    new_image_files.append(f)
+            files = watcher.poll() if watcher else transfer.list_files(input_folder_id)
+            # collect new image files in this poll, plus earlier failures whose retry is due
+            new_image_files = [f for f in files
+                               if (f['mimeType'].startswith('image/') or is_document(f['title'], f['mimeType']))
+                               and store.should_process(f['id'])]
+            listed = {f['id'] for f in new_image_files}
+            due = [f for f in store.due_retries() if f['id'] not in listed]
+            if due:
+                # current metadata of the retried files in one batched call: the stored copy is
+                # from the last attempt, and a file deleted since then is not downloaded again
+                try:
+                    current = transfer.get_metadata([f['id'] for f in due])
+                except Exception as e:
+                    print(f"[WARN] Could not refresh the metadata of retried files, using the stored copy: {e}")
+                    current = due
+                for stored, f in zip(due, current):
+                    if f is None:
+                        store.fail(stored['id'], "download", "file no longer exists")
+                    else:
+                        new_image_files.append(f)
 
             if not new_image_files:
+                if watcher:
+                    watcher.commit(files)
                 time.sleep(poll_interval)
                 continue
 
-            # process each new file and gather results
-            results = []
+            jobs = []
             for f in new_image_files:
-                print(f"[NEW] {f['title']}")
-                local_path = os.path.join("downloads", f['title'])
-                f.GetContentFile(local_path)
-                res = process_image_file(local_path, drive, output_folder_id, text_folder_id, audio_folder_id)
-                # ensure res is a dict; convert None to error dict if needed
-                if res is None:
-                    res = {"status": "error", "audio_path": None}
-                results.append((f, res))
-                # mark as processed regardless of status so we don't re-download repeatedly
-                seen.add(f['id'])
-                save_seen_files(seen)
+                store.start(f)
+                job = new_job(os.path.join("downloads", f['title']), transfer, output_folder_id, text_folder_id,
+                              audio_folder_id, drive_file=f, store=store)
+                jobs.append(restore_job(job, store.checkpoints(f['id'])))
+            # PDFs and TIFFs are processed page by page after the single images
+            documents = [job for job in jobs if is_document(job["filename"], job["drive_file"]["mimeType"])]
+            jobs = [job for job in jobs if job not in documents]
+            new_image_files = [job["drive_file"] for job in jobs]
+
+            results = []
+            stream = audio_stream(player)
+            if EXECUTOR_MODE == "pipelined":
+                # download, gate, rembg, enhancement, OCR, TTS and upload overlap across files;
+                # the gate runs per file here, results still come back in file order
+                if stream is not None:
+                    for i, job in enumerate(jobs):
+                        job.update(audio_stream=stream, stream_index=i)
+                for i, (f, (job, error)) in enumerate(zip(new_image_files, build_executor().run(jobs))):
+                    if stream is not None:
+                        stream.done(i)
+                    results.append((f, record_result(store, job, error)))
+            else:
+                # download the batch concurrently, then run the ML quality gate over all of it at once
+                to_download = [job for job in jobs if "download" not in job["done_stages"]]
+                for job in to_download:
+                    print(f"[NEW] {job['filename']}")
+                    job["stage"] = "download"
+                with metrics.stage_timer("download_batch", files=len(to_download)):
+                    downloads = transfer.download_many([(job["drive_file"], job["local_path"]) for job in to_download],
+                                                       return_exceptions=True)
+                for job, outcome in zip(to_download, downloads):
+                    if isinstance(outcome, Exception):
+                        results.append((job["drive_file"], record_result(store, job, outcome)))
+                        jobs.remove(job)
+                    else:
+                        store.checkpoint(job["file_id"], "download", job["local_path"])
+                        job["done_stages"].add("download")
+
+                # files already known to the result cache get their verdict from it in stage_quality_gate
+                to_gate = [job for job in jobs if "quality_gate" not in job["done_stages"]
+                           and not (USE_RESULT_CACHE and _get_cache(CACHE_DIR).get(_result_cache_key(job), "verdict"))]
+                with metrics.stage_timer("quality_gate_batch", files=len(to_gate)):
+                    from ml_model import process_for_ocr_batch
+                    ml_results = process_for_ocr_batch([job["local_path"] for job in to_gate], *get_models())
+                for job, ml_result in zip(to_gate, ml_results):
+                    job["ml_result"] = ml_result
+
+                # process each file; a failure only affects that file, the rest of the batch continues
+                for i, job in enumerate(jobs):
+                    if stream is not None:
+                        job.update(audio_stream=stream, stream_index=i)
+                    error = None
+                    try:
+                        job = run_job(job)
+                    except Exception as e:
+                        print(f"[ERROR] {job['filename']} failed at '{job['stage']}': {e}")
+                        error = e
+                    if stream is not None:
+                        stream.done(i)
+                    results.append((job["drive_file"], record_result(store, job, error)))
+
+            for job in documents:
+                error = None
+                try:
+                    if "download" not in job["done_stages"]:
+                        job = run_stage(job, "download", stage_download)
+                    job = process_document(job, player)
+                except Exception as e:
+                    print(f"[ERROR] {job['filename']} failed at '{job['stage']}': {e}")
+                    error = e
+                results.append((job["drive_file"], record_result(store, job, error)))
+            if watcher:
+                watcher.commit(files)
 
             # gather produced audio paths
-            audio_paths = [r[1].get("audio_path") for r in results if r[1].get("audio_path")]
+            audio_paths = [r[1].get("audio_path") for r in results if r[1].get("audio_path") and not r[1].get("streamed")]
             if not audio_paths:
                 time.sleep(poll_interval)
                 continue
 
             # Decide playback based on PLAY_MODE
             if PLAY_MODE == "immediate":
-                for ap in audio_paths:
-                    print(f"[AUDIO] Playing {ap}")
-                    play_audio_blocking(ap)
+                play_audios(audio_paths, player)
 
             elif PLAY_MODE == "batch":
                 print(f"[AUDIO] {len(audio_paths)} files queued. Playing all now.")
-                for ap in audio_paths:
-                    play_audio_blocking(ap)
+                play_audios(audio_paths, player)
 
             elif PLAY_MODE == "prompt":
                 if len(audio_paths) == 1:
                     print(f"[AUDIO] Playing single audio {audio_paths[0]}")
-                    play_audio_blocking(audio_paths[0])
+                    play_audios(audio_paths, player)
                 else:
-                    # prompt user with timeout; simple blocking prompt
-                    print(f"[DECISION] {len(audio_paths)} audios are ready. Play now? (y = play now / n = skip / b = queue for later) ")
-                    start = time.time()
-                    answer = ""
-                    try:
-                        # user input (blocking) — will wait until user types or your environment times out
-                        answer = input().strip().lower()
-                    except Exception:
+                    if DECISION_POLICY != "prompt":
+                        answer = {"continue": "y", "skip": "n", "defer": "b"}[DECISION_POLICY]
+                        print(f"[DECISION] {len(audio_paths)} audios are ready, policy '{DECISION_POLICY}'.")
+                    else:
+                        # prompt user with timeout; simple blocking prompt
+                        print(f"[DECISION] {len(audio_paths)} audios are ready. Play now? (y = play now / n = skip / b = queue for later) ")
+                        start = time.time()
                         answer = ""
-                    # timeout fallback: if empty and time exceeded, auto-skip
-                    if not answer and (time.time() - start) > PROMPT_TIMEOUT_SECONDS:
-                        answer = "n"
-                        print()
+                        try:
+                            # user input (blocking) — will wait until user types or your environment times out
+                            answer = input().strip().lower()
+                        except Exception:
+                            answer = ""
+                        # timeout fallback: if empty and time exceeded, auto-skip
+                        if not answer and (time.time() - start) > PROMPT_TIMEOUT_SECONDS:
+                            answer = "n"
+                            print()
                     if answer in ("y", "yes"):
-                        for ap in audio_paths:
-                            play_audio_blocking(ap)
+                        play_audios(audio_paths, player)
                     elif answer in ("b", "batch"):
-                        save_audio_queue(audio_paths)
+                        queue_audios(audio_paths, player)
                         print("[AUDIO] Saved to queue for later playback.")
                     else:
                         print("[AUDIO] Skipped playback.")
-            prompt_play_queue()
+            prompt_play_queue(player=player)
             time.sleep(poll_interval)
         except Exception as e:
             print("[ERROR]", e)
             time.sleep(30)
 
-def prompt_play_queue(queue_file="audio_queue.json"):
+def prompt_play_queue(queue_file="audio_queue.json", player=None):
     """
     If there is a queue in queue_file, ask the user whether to play it now.
     If the user answers y/yes -> call play_queued_audios() and then continue starting the watcher.
     If the user answers anything else or the file is empty -> skip.
+    With the playback service, the queue is its held entries and "y" releases them to the player.
     """
-    q = load_audio_queue(queue_file)
+    if player is not None:
+        queue_file = player.queue.log_path
+        q = player.queue.pending("held")
+    else:
+        q = load_audio_queue(queue_file)
     if not q:
         return
-    try:
-        resp = input(f"[AUDIO QUEUE] Found {len(q)} files in '{queue_file}'. Play the queue now? (y = play / n = skip): ").strip().lower()
-    except Exception:
-        resp = ""
+    if DECISION_POLICY in ("skip", "defer"):
+        return  # headless: the queue waits until someone plays it
+    if DECISION_POLICY == "continue":
+        resp = "y"
+    else:
+        try:
+            resp = input(f"[AUDIO QUEUE] Found {len(q)} files in '{queue_file}'. Play the queue now? (y = play / n = skip): ").strip().lower()
+        except Exception:
+            resp = ""
     if resp in ("y", "yes"):
         print("[AUDIO] Starting queued playback...")
-        play_queued_audios(queue_file)
+        if player is not None:
+            player.queue.release_held()
+        else:
+            play_queued_audios(queue_file)
     else:
         print("[AUDIO] Skipping queued playback.")
 
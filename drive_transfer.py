@@ -0,0 +1,258 @@
+import mimetypes
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+# --- CONFIG ---
+TRANSFER_WORKERS = 4
+# Files at least this big are uploaded resumably in UPLOAD_CHUNK_SIZE chunks
+RESUMABLE_THRESHOLD = 5 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+NUM_RETRIES = 3
+
+FILE_FIELDS = "id,title,mimeType,modifiedDate,md5Checksum,fileSize"
+
+
+class TransferBackend:
+    """
+    Where input files come from and outputs go to. Files are dicts with at least
+    'id', 'title', 'mimeType' and 'modifiedDate' (RFC 3339, UTC).
+    Subclasses implement the single-file calls, the *_many helpers run them concurrently.
+    """
+
+    # Backends with a change log (Drive's changes feed) report every file added to a folder,
+    # whatever its modifiedDate; see IncrementalWatcher
+    supports_changes = False
+
+    def __init__(self, max_workers=TRANSFER_WORKERS):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transfer")
+
+    def list_files(self, folder_id):
+        raise NotImplementedError
+
+    def list_changed_files(self, folder_id, modified_since):
+        """Files in folder_id with modifiedDate >= modified_since (RFC 3339 string, or None for all)."""
+        files = self.list_files(folder_id)
+        if modified_since is None:
+            return files
+        return [f for f in files if f["modifiedDate"] >= modified_since]
+
+    def changes_start_token(self):
+        """Token of the current end of the change log."""
+        raise NotImplementedError
+
+    def list_changes(self, folder_id, page_token):
+        """(files in folder_id added or changed since page_token, token to continue from)."""
+        raise NotImplementedError
+
+    def download(self, file, local_path):
+        raise NotImplementedError
+
+    def upload(self, local_path, folder_id):
+        """Upload one file, return the new file id."""
+        raise NotImplementedError
+
+    def get_metadata(self, file_ids):
+        """File dicts of file_ids, in order; None for a file that does not exist (any more)."""
+        return [self._get_one(file_id) for file_id in file_ids]
+
+    def _get_one(self, file_id):
+        raise NotImplementedError
+
+    def download_many(self, pairs, return_exceptions=False):
+        """
+        Download [(file, local_path), ...] concurrently, returns the local paths in order.
+        With return_exceptions=True a failed download shows up as its exception instead of raising.
+        """
+        futures = [self._pool.submit(self.download, f, path) for f, path in pairs]
+        if not return_exceptions:
+            return [fut.result() for fut in futures]
+        return [fut.exception() or fut.result() for fut in futures]
+
+    def upload_many(self, pairs):
+        """Upload [(local_path, folder_id), ...] concurrently, returns the new file ids in order."""
+        futures = [self._pool.submit(self.upload, path, folder_id) for path, folder_id in pairs]
+        return [fut.result() for fut in futures]
+
+
+class DriveBackend(TransferBackend):
+    """
+    Google Drive (API v2, as used by pydrive2). Every worker thread gets its own authorized
+    httplib2 connection that is kept open and reused across requests.
+    """
+
+    supports_changes = True
+
+    def __init__(self, drive, max_workers=TRANSFER_WORKERS):
+        super().__init__(max_workers)
+        self.drive = drive
+        self._local = threading.local()
+
+    @property
+    def _service(self):
+        return self.drive.auth.service
+
+    def _http(self):
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = self.drive.auth.Get_Http_Object()
+        return http
+
+    def list_files(self, folder_id, extra_query=""):
+        query = f"'{folder_id}' in parents and trashed=false" + (f" and {extra_query}" if extra_query else "")
+        files, page_token = [], None
+        while True:
+            resp = self._service.files().list(q=query, maxResults=1000, pageToken=page_token,
+                                              fields=f"nextPageToken,items({FILE_FIELDS})"
+                                              ).execute(http=self._http(), num_retries=NUM_RETRIES)
+            files.extend(resp.get("items", []))
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                return files
+
+    def list_changed_files(self, folder_id, modified_since):
+        # filtered server-side, so a poll only costs pages for the new/changed files
+        if modified_since is None:
+            return self.list_files(folder_id)
+        return self.list_files(folder_id, extra_query=f"modifiedDate >= '{modified_since}'")
+
+    def changes_start_token(self):
+        resp = self._service.changes().getStartPageToken().execute(http=self._http(), num_retries=NUM_RETRIES)
+        return resp["startPageToken"]
+
+    def list_changes(self, folder_id, page_token):
+        # a file moved into the folder, or uploaded with an old modifiedDate, is a change too
+        files = {}
+        while True:
+            resp = self._service.changes().list(pageToken=page_token, includeDeleted=False, maxResults=1000,
+                                                fields=f"nextPageToken,newStartPageToken,"
+                                                       f"items(file({FILE_FIELDS},parents(id),labels/trashed))"
+                                                ).execute(http=self._http(), num_retries=NUM_RETRIES)
+            for item in resp.get("items", []):
+                file = item.get("file")
+                if (file and not file.get("labels", {}).get("trashed")
+                        and any(parent["id"] == folder_id for parent in file.get("parents", []))):
+                    files[file["id"]] = file
+            if "newStartPageToken" in resp:
+                return list(files.values()), resp["newStartPageToken"]
+            page_token = resp["nextPageToken"]
+
+    def download(self, file, local_path):
+        from googleapiclient.http import MediaIoBaseDownload
+
+        request = self._service.files().get_media(fileId=file["id"])
+        request.http = self._http()
+        with open(local_path, "wb") as fh:
+            downloader = MediaIoBaseDownload(fh, request, chunksize=DOWNLOAD_CHUNK_SIZE)
+            done = False
+            while not done:
+                _, done = downloader.next_chunk(num_retries=NUM_RETRIES)
+        return local_path
+
+    def upload(self, local_path, folder_id):
+        from googleapiclient.http import MediaFileUpload
+
+        file_name = os.path.basename(local_path)
+        mimetype = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+        resumable = os.path.getsize(local_path) >= RESUMABLE_THRESHOLD
+        media = MediaFileUpload(local_path, mimetype=mimetype, resumable=resumable,
+                                chunksize=UPLOAD_CHUNK_SIZE if resumable else -1)
+        request = self._service.files().insert(body={"title": file_name, "parents": [{"id": folder_id}]},
+                                               media_body=media, fields="id")
+        http = self._http()
+        if resumable:
+            response = None
+            while response is None:
+                _, response = request.next_chunk(http=http, num_retries=NUM_RETRIES)
+        else:
+            response = request.execute(http=http, num_retries=NUM_RETRIES)
+        print(f"[Drive] Uploaded: {file_name}")
+        return response["id"]
+
+    def get_metadata(self, file_ids):
+        """
+        Metadata of many files in one batched HTTP request (up to 100 per batch); None for
+        missing or trashed files. Any other failed lookup raises once the batches are done.
+        """
+        results, errors = {}, []
+
+        def callback(request_id, response, exception):
+            if exception is not None:
+                if getattr(getattr(exception, "resp", None), "status", None) != 404:
+                    errors.append(exception)
+                response = None
+            elif response.get("labels", {}).get("trashed"):
+                response = None
+            results[request_id] = response
+
+        for i in range(0, len(file_ids), 100):
+            batch = self._service.new_batch_http_request(callback=callback)
+            for file_id in file_ids[i:i + 100]:
+                batch.add(self._service.files().get(fileId=file_id, fields=FILE_FIELDS + ",labels/trashed"),
+                          request_id=file_id)
+            batch.execute(http=self._http())
+        if errors:
+            raise errors[0]
+        return [results.get(file_id) for file_id in file_ids]
+
+
+class LocalFolderBackend(TransferBackend):
+    """
+    Local-filesystem stand-in for Drive: folder ids are subdirectories of root and
+    file ids are "<folder_id>/<name>". latency adds a fixed delay per call to mimic
+    network round-trips when benchmarking.
+    """
+
+    def __init__(self, root, max_workers=TRANSFER_WORKERS, latency=0.0):
+        super().__init__(max_workers)
+        self.root = root
+        self.latency = latency
+
+    def _folder(self, folder_id):
+        path = os.path.join(self.root, folder_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _file_dict(self, folder_id, name):
+        path = os.path.join(self.root, folder_id, name)
+        mtime = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc)
+        return {
+            "id": f"{folder_id}/{name}",
+            "title": name,
+            "mimeType": mimetypes.guess_type(name)[0] or "application/octet-stream",
+            "modifiedDate": mtime.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+            "fileSize": str(os.path.getsize(path)),
+        }
+
+    def list_files(self, folder_id):
+        time.sleep(self.latency)
+        folder = self._folder(folder_id)
+        return [self._file_dict(folder_id, name) for name in sorted(os.listdir(folder))
+                if os.path.isfile(os.path.join(folder, name))]
+
+    def download(self, file, local_path):
+        time.sleep(self.latency)
+        shutil.copyfile(os.path.join(self.root, file["id"]), local_path)
+        return local_path
+
+    def upload(self, local_path, folder_id):
+        time.sleep(self.latency)
+        file_name = os.path.basename(local_path)
+        shutil.copyfile(local_path, os.path.join(self._folder(folder_id), file_name))
+        print(f"[Local] Uploaded: {file_name}")
+        return f"{folder_id}/{file_name}"
+
+    def _get_one(self, file_id):
+        folder_id, name = os.path.split(file_id)
+        if not os.path.isfile(os.path.join(self.root, file_id)):
+            return None
+        return self._file_dict(folder_id, name)
+
+    def get_metadata(self, file_ids):
+        time.sleep(self.latency)
+        return [self._get_one(file_id) for file_id in file_ids]
@@ -0,0 +1,171 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DB_PATH = "jobs.db"
+# After this many failed attempts a file is parked as "dead" and no longer retried
+MAX_ATTEMPTS = 5
+# Retry delay: RETRY_BASE_SECONDS * 2 ** (attempts - 1), capped at RETRY_MAX_SECONDS
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+
+# Final states, a file in one of these is not picked up again
+# ("deferred" waits for a review decision, see review_queue.py)
+FINAL_STATUSES = ("processed", "skipped", "dead", "deferred")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    file_id TEXT PRIMARY KEY,
+    file_json TEXT,
+    status TEXT NOT NULL,
+    stage TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS stages (
+    file_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    artifact TEXT,
+    finished_at REAL NOT NULL,
+    PRIMARY KEY (file_id, stage)
+);
+"""
+
+
+class JobStore:
+    """
+    SQLite (WAL) record of every input file: its status, the last stage reached,
+    a checkpoint per finished stage (with the artifact it produced) and retry bookkeeping.
+    Replaces processed_files.json; every update touches only the rows of one file.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def import_seen_files(self, seen_path="processed_files.json"):
+        """One-off migration: mark ids from the old processed_files.json as processed."""
+        if not os.path.exists(seen_path):
+            return 0
+        try:
+            with open(seen_path, "r") as f:
+                ids = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR IGNORE INTO jobs (file_id, status, created_at, updated_at) VALUES (?, 'processed', ?, ?)",
+                [(file_id, now, now) for file_id in ids])
+            self._db.execute("COMMIT")
+        os.replace(seen_path, seen_path + ".migrated")
+        print(f"[JOBS] Imported {len(ids)} ids from {seen_path}")
+        return len(ids)
+
+    def get(self, file_id):
+        rows = self._execute("SELECT * FROM jobs WHERE file_id = ?", (file_id,))
+        return dict(rows[0]) if rows else None
+
+    def should_process(self, file_id, now=None):
+        """True for unknown files, interrupted runs, approved reviews and failed files whose retry is due."""
+        job = self.get(file_id)
+        if job is None or job["status"] in ("running", "approved"):
+            return True
+        if job["status"] == "failed":
+            return (job["next_attempt_at"] or 0) <= (now or time.time())
+        return False
+
+    def due_retries(self, now=None):
+        """Stored file dicts of failed/interrupted/approved jobs that are due again."""
+        rows = self._execute(
+            "SELECT file_json FROM jobs WHERE file_json IS NOT NULL AND "
+            "(status IN ('running', 'approved') OR (status = 'failed' AND next_attempt_at <= ?))",
+            (now or time.time(),))
+        return [json.loads(row["file_json"]) for row in rows]
+
+    def start(self, file):
+        now = time.time()
+        file_json = json.dumps({k: file[k] for k in ("id", "title", "mimeType", "modifiedDate") if k in file})
+        self._execute(
+            "INSERT INTO jobs (file_id, file_json, status, created_at, updated_at) VALUES (?, ?, 'running', ?, ?) "
+            "ON CONFLICT(file_id) DO UPDATE SET status = 'running', file_json = excluded.file_json, "
+            "updated_at = excluded.updated_at",
+            (file["id"], file_json, now, now))
+
+    def checkpoint(self, file_id, stage, artifact=None):
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute("INSERT OR REPLACE INTO stages (file_id, stage, artifact, finished_at) VALUES (?, ?, ?, ?)",
+                             (file_id, stage, artifact, now))
+            self._db.execute("UPDATE jobs SET stage = ?, updated_at = ? WHERE file_id = ?", (stage, now, file_id))
+            self._db.execute("COMMIT")
+
+    def checkpoints(self, file_id):
+        """{stage: artifact} of the stages this file already finished."""
+        rows = self._execute("SELECT stage, artifact FROM stages WHERE file_id = ?", (file_id,))
+        return {row["stage"]: row["artifact"] for row in rows}
+
+    def finish(self, file_id, status):
+        self._execute("UPDATE jobs SET status = ?, error = NULL, next_attempt_at = NULL, updated_at = ? "
+                      "WHERE file_id = ?", (status, time.time(), file_id))
+
+    def fail(self, file_id, stage, error):
+        """Record a failure; schedules a retry with exponential backoff or parks the job as dead."""
+        job = self.get(file_id)
+        attempts = (job["attempts"] if job else 0) + 1
+        now = time.time()
+        if attempts >= MAX_ATTEMPTS:
+            status, next_attempt_at = "dead", None
+            print(f"[JOBS] {file_id} failed {attempts} times, giving up (last stage: {stage}).")
+        else:
+            status = "failed"
+            next_attempt_at = now + min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+            print(f"[JOBS] {file_id} failed at '{stage}', retry {attempts}/{MAX_ATTEMPTS - 1} "
+                  f"in {next_attempt_at - now:.0f}s.")
+        self._execute("UPDATE jobs SET status = ?, stage = ?, attempts = ?, next_attempt_at = ?, error = ?, "
+                      "updated_at = ? WHERE file_id = ?",
+                      (status, stage, attempts, next_attempt_at, str(error), now, file_id))
+
+    def defer(self, file_id, reason):
+        """Park a file for human review; the watcher does not pick it up again until it is resolved."""
+        self._execute("UPDATE jobs SET status = 'deferred', error = ?, next_attempt_at = NULL, updated_at = ? "
+                      "WHERE file_id = ?", (reason, time.time(), file_id))
+
+    def deferred(self):
+        """Jobs waiting for review, oldest first."""
+        rows = self._execute("SELECT * FROM jobs WHERE status = 'deferred' ORDER BY updated_at")
+        return [dict(row) for row in rows]
+
+    def resolve(self, file_id, decision):
+        """
+        Review decision for a deferred file: "continue" hands it back to the watcher, which
+        no longer runs the quality gate on it (the "review" checkpoint); "skip" closes it as skipped.
+        """
+        job = self.get(file_id)
+        if job is None or job["status"] != "deferred":
+            raise ValueError(f"{file_id} is not waiting for review")
+        if decision == "continue":
+            self.checkpoint(file_id, "review", "approved")
+            self._execute("UPDATE jobs SET status = 'approved', error = NULL, updated_at = ? WHERE file_id = ?",
+                          (time.time(), file_id))
+        elif decision == "skip":
+            self.finish(file_id, "skipped")
+        else:
+            raise ValueError(f"Unknown review decision: {decision}")
@@ -0,0 +1,188 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- CONFIG ---
+# JSON lines file with one record per stage call, e.g. "metrics.jsonl" (None = off)
+METRICS_LOG = None
+# Port of the local Prometheus endpoint (http://127.0.0.1:<port>/metrics), e.g. 9108 (0 = off)
+METRICS_PORT = 0
+# Print the per-step messages of the hot path (image analysis, enhancement actions) to the console
+VERBOSE = False
+# File names to run the sampling profiler on ("*" = every file); output goes to PROFILE_DIR
+PROFILE_FILES = set()
+PROFILE_DIR = "profiles"
+PROFILE_INTERVAL = 0.005
+
+HISTOGRAM_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# File currently being processed by this thread (set by the pipeline around each stage)
+current_file = contextvars.ContextVar("current_file", default=None)
+
+
+class _Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._log = None
+        self.calls = Counter()
+        self.wall = Counter()
+        self.cpu = Counter()
+        self.queue_wait = Counter()
+        self.buckets = defaultdict(lambda: [0] * len(HISTOGRAM_BUCKETS))
+
+    def record(self, record):
+        stage, wall = record["stage"], record["wall_s"]
+        with self._lock:
+            self.calls[stage] += 1
+            self.wall[stage] += wall
+            self.cpu[stage] += record["cpu_s"]
+            self.queue_wait[stage] += record.get("queue_wait_s") or 0.0
+            counts = self.buckets[stage]
+            for i, bound in enumerate(HISTOGRAM_BUCKETS):
+                if wall <= bound:
+                    counts[i] += 1
+            if METRICS_LOG:
+                if self._log is None:
+                    self._log = open(METRICS_LOG, "a", encoding="utf-8", buffering=1)
+                self._log.write(json.dumps(record, default=_json_default) + "\n")
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            for name, help_text, values in (
+                ("soundbook_stage_calls_total", "Stage calls", self.calls),
+                ("soundbook_stage_wall_seconds_total", "Wall time spent in the stage", self.wall),
+                ("soundbook_stage_cpu_seconds_total", "CPU time of the calling thread in the stage", self.cpu),
+                ("soundbook_stage_queue_wait_seconds_total", "Time items waited in front of the stage", self.queue_wait),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                lines += [f'{name}{{stage="{stage}"}} {value:.6g}' for stage, value in sorted(values.items())]
+            name = "soundbook_stage_duration_seconds"
+            lines += [f"# HELP {name} Stage wall time", f"# TYPE {name} histogram"]
+            for stage, counts in sorted(self.buckets.items()):
+                for bound, count in zip(HISTOGRAM_BUCKETS, counts):
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {self.calls[stage]}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {self.wall[stage]:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {self.calls[stage]}')
+        return "\n".join(lines) + "\n"
+
+
+registry = _Registry()
+
+
+def _json_default(value):
+    # numpy scalars (np.float64, np.bool_) from analyze_image and friends
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+@contextmanager
+def stage_timer(stage, image=None, queue_wait=None, **fields):
+    """
+    Time a block: wall time, CPU time of this thread and the input image size.
+    Yields the record dict so the block can add fields before it is emitted.
+    CPU time does not include subprocesses (tesseract) or native worker threads (onnxruntime).
+    """
+    record = {"ts": time.time(), "stage": stage, "file": current_file.get()}
+    if image is not None:
+        record["height"], record["width"] = image.shape[:2]
+    if queue_wait is not None:
+        record["queue_wait_s"] = round(queue_wait, 6)
+    record.update(fields)
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        yield record
+    finally:
+        record["wall_s"] = round(time.perf_counter() - wall_start, 6)
+        record["cpu_s"] = round(time.thread_time() - cpu_start, 6)
+        registry.record(record)
+
+
+def log(tag, message):
+    """Console message for the hot path, only shown with VERBOSE."""
+    if VERBOSE:
+        print(f"[{tag}] {message}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port=None, host="127.0.0.1"):
+    """Serve /metrics in a daemon thread; returns the server, or None when disabled or the port is taken."""
+    port = METRICS_PORT if port is None else port
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        # e.g. a second watcher on the same port: carry on without the endpoint
+        print(f"[METRICS] Could not serve on {host}:{port} ({e}), endpoint disabled")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    print(f"[METRICS] Prometheus endpoint on http://{host}:{port}/metrics")
+    return server
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread every `interval` seconds and appends the counts in
+    collapsed-stack format (flamegraph.pl / speedscope) to out_path.
+    """
+
+    def __init__(self, out_path, thread_id=None, interval=PROFILE_INTERVAL):
+        self.out_path = out_path
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="sampling-profiler")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        os.makedirs(os.path.dirname(self.out_path) or ".", exist_ok=True)
+        with open(self.out_path, "a", encoding="utf-8") as f:
+            for stack, count in self.samples.items():
+                f.write(f"{stack} {count}\n")
+        return False
+
+
+def profiler_for(filename):
+    """SamplingProfiler for the current thread if filename is selected in PROFILE_FILES, else a no-op."""
+    if filename is None or not ("*" in PROFILE_FILES or filename in PROFILE_FILES):
+        return nullcontext()
+    return SamplingProfiler(os.path.join(PROFILE_DIR, f"{filename}.folded"))
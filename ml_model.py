@@ -2,57 +2,147 @@ import os, cv2, joblib, torch
 import numpy as np
 from torchvision import transforms, models
 from PIL import Image
+import cnn_engine
 
-def load_models(base_dir):
+# CNN input transform, built once instead of on every prediction
+_CNN_TRANSFORM = transforms.Compose([
+    transforms.Resize((224,224)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485,0.456,0.406],
+                         std=[0.229,0.224,0.225])
+])
+
+# Max images per CNN forward pass in predict_batch
+CNN_BATCH_SIZE = 32
+# Files process_for_ocr_batch decodes at a time (12-48 MP photos take 36-144 MB each)
+GATE_BATCH_SIZE = 8
+
+# Quality gate: "dual" (RF and CNN on every page, bad if either says so) or "cascade"
+# (RF first on a downsampled page; the CNN only runs when the RF is unsure)
+GATE_MODE = "dual"
+# RF probability of "bad" inside [low, high] counts as unsure and is passed on to the CNN
+CASCADE_BAND = (0.2, 0.8)
+# Longest side of the page the cascade computes RF features on (None = full resolution)
+CASCADE_MAX_SIDE = 1024
+
+def load_models(base_dir, cnn_backend=None, quantization=None, threads=None):
+    """
+    cnn_backend/quantization/threads default to cnn_engine's CNN_BACKEND, CNN_QUANTIZATION
+    and CNN_THREADS; the optimized backends run on the CPU.
+    """
     rf_model = joblib.load(os.path.join(base_dir, "picture_detection_RF.pkl"))
-    device = "cuda" if torch.cuda.is_available() else "cpu"
+    cnn_backend = cnn_backend or cnn_engine.CNN_BACKEND
+    device = "cuda" if torch.cuda.is_available() and cnn_backend == "torch" else "cpu"
     cnn_model = models.efficientnet_b0(weights=None)
     cnn_model.classifier[1] = torch.nn.Linear(cnn_model.classifier[1].in_features, 2)
     latest_model = os.path.join(base_dir, "cnn_fold5.pth")
     cnn_model.load_state_dict(torch.load(latest_model, map_location=device))
     cnn_model.to(device)
     cnn_model.eval()
+    cnn_model = cnn_engine.build_cnn(cnn_model, latest_model, cnn_backend, quantization, threads,
+                                     transform=_CNN_TRANSFORM)
     return rf_model, cnn_model, device
 
-def extract_features(img_path):
-    img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-    if img is None:
-        return None
+def features_from_gray(img):
+    """RF features of an already decoded grayscale image."""
     brightness = img.mean()
     contrast = img.std()
     edges = cv2.Canny(img, 100, 200)
-    edge_density = np.sum(edges > 0) / edges.size
+    edge_density = np.count_nonzero(edges) / edges.size
     edge_var = np.var(edges)
-    hist = cv2.calcHist([img], [0], None, [256], [0,256])
+    hist = cv2.calcHist([img], [0], None, [256], [0,256]).ravel()
     hist = hist / hist.sum()
-    entropy = -np.sum([p*np.log2(p) for p in hist if p!=0])
+    p = hist[hist > 0]
+    entropy = -np.sum(p * np.log2(p))
     return [brightness, contrast, edge_density, edge_var, entropy]
 
+def extract_features(img_path):
+    img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return None
+    return features_from_gray(img)
+
 def predict_image(img_path, rf_model, cnn_model, device):
     features = extract_features(img_path)
     if features is None:
         raise ValueError(f"Could not extract features from {img_path}")
     features = np.array(features).reshape(1,-1)
     rf_pred = int(rf_model.predict(features)[0])
-    transform = transforms.Compose([
-        transforms.Resize((224,224)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485,0.456,0.406],
-                             std=[0.229,0.224,0.225])
-    ])
     img = Image.open(img_path).convert("RGB")
-    tensor = transform(img).unsqueeze(0).to(device)
+    tensor = _CNN_TRANSFORM(img).unsqueeze(0).to(device)
     with torch.no_grad():
         output = cnn_model(tensor)
         cnn_pred = int(torch.argmax(output,1).item())
     return rf_pred, cnn_pred
 
+def cnn_predict(images, cnn_model, device):
+    """CNN class for every decoded BGR image, in batches of CNN_BATCH_SIZE."""
+    cnn_preds = []
+    for i in range(0, len(images), CNN_BATCH_SIZE):
+        chunk = images[i:i + CNN_BATCH_SIZE]
+        tensors = [_CNN_TRANSFORM(Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))) for img in chunk]
+        batch = torch.stack(tensors).to(device)
+        with torch.no_grad():
+            output = cnn_model(batch)
+        cnn_preds.extend(torch.argmax(output, 1).tolist())
+    return [int(c) for c in cnn_preds]
+
+def downsample_gray(img, max_side=None):
+    """Grayscale copy of a BGR image with its longest side reduced to max_side."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    h, w = gray.shape[:2]
+    if max_side and max(h, w) > max_side:
+        scale = max_side / max(h, w)
+        gray = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    return gray
+
+def predict_cascade(images, rf_model, cnn_model, device, band=None, max_side=None):
+    """
+    Cascaded gate for decoded BGR images. The RF scores every page from features of a
+    downsampled copy; only pages whose P(bad) lies inside band also go through the CNN.
+    Returns a list of (rf_pred, cnn_pred, p_bad); cnn_pred is None when the RF decided alone.
+    """
+    if not images:
+        return []
+    low, high = band or CASCADE_BAND
+    max_side = CASCADE_MAX_SIDE if max_side is None else max_side
+    features = np.array([features_from_gray(downsample_gray(img, max_side)) for img in images])
+    bad_column = list(rf_model.classes_).index(1)
+    p_bad = rf_model.predict_proba(features)[:, bad_column]
+    rf_preds = (p_bad >= 0.5).astype(int)
+
+    unsure = [i for i, p in enumerate(p_bad) if low <= p <= high]
+    cnn_preds = [None] * len(images)
+    for i, pred in zip(unsure, cnn_predict([images[i] for i in unsure], cnn_model, device)):
+        cnn_preds[i] = pred
+    print(f"[ML] Cascade: {len(images) - len(unsure)}/{len(images)} page(s) decided by the RF alone")
+    return [(int(r), c, float(p)) for r, c, p in zip(rf_preds, cnn_preds, p_bad)]
+
+def gate_verdict(rf_pred, cnn_pred):
+    """bad_quality from the model votes: the dual rule, or the RF alone when the cascade skipped the CNN."""
+    return rf_pred == 1 if cnn_pred is None else (cnn_pred == 1 or rf_pred == 1)
+
+def predict_batch(images, rf_model, cnn_model, device):
+    """
+    Batch version of predict_image for already decoded BGR images.
+    Runs the RF once over all feature rows and the CNN in batches of CNN_BATCH_SIZE.
+    Returns a list of (rf_pred, cnn_pred).
+    """
+    if not images:
+        return []
+    features = np.array([features_from_gray(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)) for img in images])
+    rf_preds = rf_model.predict(features).astype(int)
+    cnn_preds = cnn_predict(images, cnn_model, device)
+    return [(int(r), int(c)) for r, c in zip(rf_preds, cnn_preds)]
+
 def process_for_ocr(img_path, rf_model, cnn_model, device):
     """
     Returns:
       img: cv2 image read from img_path (or None)
       bad_quality: True if detected embedded images or poor quality, else False
     """
+    if GATE_MODE == "cascade":
+        return _gate_decoded([img_path], rf_model, cnn_model, device)[0]
     try:
         rf_pred, cnn_pred = predict_image(img_path, rf_model, cnn_model, device)
     except Exception as e:
@@ -64,4 +154,51 @@ def process_for_ocr(img_path, rf_model, cnn_model, device):
         print("⚠️ Detected embedded images or poor quality page.")
     else:
         print("✅ Page appears clean and ready for OCR.")
-    return cv2.imread(img_path), bad_quality
\ No newline at end of file
+    return cv2.imread(img_path), bad_quality
+
+def process_for_ocr_batch(img_paths, rf_model, cnn_model, device, batch_size=None):
+    """
+    Batch version of process_for_ocr for all new images of a poll cycle.
+    Files are decoded and scored GATE_BATCH_SIZE at a time and released after their chunk,
+    so a large poll never sits in memory whole; the next stage decodes its file again.
+    Returns a list of (None, bad_quality) in the order of img_paths.
+    """
+    batch_size = batch_size or GATE_BATCH_SIZE
+    results = []
+    for start in range(0, len(img_paths), batch_size):
+        chunk = _gate_decoded(img_paths[start:start + batch_size], rf_model, cnn_model, device)
+        results += [(None, bad_quality) for _, bad_quality in chunk]
+    return results
+
+def process_for_ocr_image(img, name, rf_model, cnn_model, device):
+    """process_for_ocr for an image that is already decoded (e.g. a document page); name is for the log."""
+    return _gate_decoded([name], rf_model, cnn_model, device, images=[img])[0]
+
+def _gate_decoded(img_paths, rf_model, cnn_model, device, images=None):
+    """(img, bad_quality) for every path, all decoded at once (unless images are passed in)."""
+    if images is None:
+        images = [cv2.imread(p) for p in img_paths]
+    valid = [i for i, img in enumerate(images) if img is not None]
+    for i, p in enumerate(img_paths):
+        if images[i] is None:
+            print(f"[ML ERROR] Could not decode {p}")
+
+    try:
+        if GATE_MODE == "cascade":
+            preds = [(rf, cnn) for rf, cnn, _ in predict_cascade([images[i] for i in valid], rf_model, cnn_model, device)]
+        else:
+            preds = predict_batch([images[i] for i in valid], rf_model, cnn_model, device)
+    except Exception as e:
+        print(f"[ML ERROR] batch prediction failed: {e}")
+        preds = [(0, 0)] * len(valid)
+
+    results = [(img, False) for img in images]
+    for i, (rf_pred, cnn_pred) in zip(valid, preds):
+        bad_quality = gate_verdict(rf_pred, cnn_pred)
+        name = os.path.basename(img_paths[i])
+        if bad_quality:
+            print(f"⚠️ {name}: Detected embedded images or poor quality page.")
+        else:
+            print(f"✅ {name}: Page appears clean and ready for OCR.")
+        results[i] = (images[i], bad_quality)
+    return results
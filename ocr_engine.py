@@ -0,0 +1,90 @@
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+# --- CONFIG ---
+# Warm Tesseract API handles kept in the pool (one per concurrent OCR call / block worker)
+OCR_POOL_SIZE = os.cpu_count() or 1
+OCR_LANG = "eng"
+OCR_PSM = 3
+# Folder containing eng.traineddata, None = tesserocr's default
+TESSDATA_PATH = None
+
+
+class TesseractPool:
+    """
+    In-process Tesseract (tesserocr) handles, loaded once and reused. Images are passed as
+    numpy buffers, so there is no tesseract subprocess and no temp file per call.
+    tesserocr releases the GIL while recognizing, so handles can work in parallel threads.
+    """
+
+    def __init__(self, size=OCR_POOL_SIZE, lang=OCR_LANG, psm=OCR_PSM, tessdata_path=TESSDATA_PATH):
+        from tesserocr import PyTessBaseAPI
+
+        self.psm = psm
+        self._apis = queue.Queue()
+        kwargs = {"lang": lang, "psm": self.psm}
+        if tessdata_path:
+            kwargs["path"] = tessdata_path
+        for _ in range(max(1, size)):
+            self._apis.put(PyTessBaseAPI(**kwargs))
+        self._executor = ThreadPoolExecutor(max_workers=max(1, size), thread_name_prefix="ocr-block")
+        print(f"[OCR] {max(1, size)} Tesseract handle(s) ready (lang={lang}, psm={psm})")
+
+    @contextmanager
+    def _api(self):
+        api = self._apis.get()
+        try:
+            yield api
+        finally:
+            self._apis.put(api)
+
+    @staticmethod
+    def _set_image(api, image):
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = np.ascontiguousarray(gray, dtype=np.uint8)
+        h, w = gray.shape
+        api.SetImageBytes(gray.tobytes(), w, h, 1, w)
+
+    def _recognize(self, image, psm=None):
+        with self._api() as api:
+            if psm is not None:
+                api.SetPageSegMode(psm)
+            try:
+                self._set_image(api, image)
+                text = api.GetUTF8Text()
+                words = api.MapWordConfidences()
+            finally:
+                if psm is not None:
+                    api.SetPageSegMode(self.psm)
+                api.Clear()
+        return text, words
+
+    def ocr(self, image):
+        """OCR a whole page. Returns (text, [(word, confidence), ...])."""
+        return self._recognize(image)
+
+    def ocr_blocks(self, image):
+        """
+        Find the page's text blocks, then OCR them in parallel (one handle per block).
+        Returns (text, [(word, confidence), ...]) with blocks in Tesseract's reading order.
+        """
+        from tesserocr import RIL, PSM
+
+        with self._api() as api:
+            self._set_image(api, image)
+            components = api.GetComponentImages(RIL.BLOCK, True)
+            api.Clear()
+        boxes = [c[1] for c in components]
+        if len(boxes) <= 1:
+            return self.ocr(image)
+
+        crops = [image[b["y"]:b["y"] + b["h"], b["x"]:b["x"] + b["w"]] for b in boxes]
+        results = list(self._executor.map(lambda crop: self._recognize(crop, PSM.SINGLE_BLOCK), crops))
+        text = "\n".join(t.strip("\n") for t, _ in results if t.strip())
+        words = [w for _, block_words in results for w in block_words]
+        return text, words
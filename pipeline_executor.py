@@ -0,0 +1,104 @@
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+class Stage:
+    """One pipeline step: fn(item) -> item, run by `workers` threads."""
+
+    def __init__(self, name, fn, workers=1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+
+
+class StagedExecutor:
+    """
+    Runs items through a list of stages, each stage with its own worker pool and a bounded
+    queue in front of it, so different files can be in different stages at the same time.
+    Results come out in input order.
+
+    Worker threads are enough to keep several cores busy here: the heavy stages (OpenCV,
+    ONNX Runtime, the tesseract subprocess, network I/O) all release the GIL.
+    """
+
+    def __init__(self, stages, queue_size=4, should_stop=None, on_dequeue=None):
+        self.stages = stages
+        self.queue_size = queue_size
+        # should_stop(item) -> True to skip the remaining stages for this item
+        self.should_stop = should_stop or (lambda item: False)
+        # on_dequeue(stage_name, item, seconds) is called with the time the item waited in the stage's queue
+        self.on_dequeue = on_dequeue
+
+    def _worker(self, stage, in_q, out_q, remaining, lock, n_next):
+        while True:
+            entry = in_q.get()
+            if entry is _DONE:
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    # one _DONE per worker of the next stage (or one for the collector)
+                    for _ in range(n_next):
+                        out_q.put(_DONE)
+                return
+            seq, item, error, queued_at = entry
+            if error is None and not self.should_stop(item):
+                if self.on_dequeue is not None:
+                    self.on_dequeue(stage.name, item, time.perf_counter() - queued_at)
+                try:
+                    item = stage.fn(item)
+                except Exception as e:
+                    print(f"[PIPELINE ERROR] stage '{stage.name}' failed: {e}")
+                    error = e
+            out_q.put((seq, item, error, time.perf_counter()))
+
+    def run(self, items):
+        """
+        Generator yielding (item, error) for every input item, in input order.
+        error is None when all stages succeeded. If iterating items raises, the
+        items before it still come out, followed by (None, error).
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = []
+        for i, stage in enumerate(self.stages):
+            n_next = self.stages[i + 1].workers if i + 1 < len(self.stages) else 1
+            remaining, lock = [stage.workers], threading.Lock()
+            for w in range(stage.workers):
+                threads.append(threading.Thread(target=self._worker,
+                                                args=(stage, queues[i], queues[i + 1], remaining, lock, n_next),
+                                                daemon=True, name=f"{stage.name}-{w}"))
+
+        def feed():
+            seq = 0
+            try:
+                for item in items:
+                    queues[0].put((seq, item, None, time.perf_counter()))
+                    seq += 1
+            except Exception as e:
+                # the input generator itself failed: it comes out as a last (None, error) result
+                print(f"[PIPELINE ERROR] reading the input failed: {e}")
+                queues[0].put((seq, None, e, time.perf_counter()))
+            finally:
+                for _ in range(self.stages[0].workers if self.stages else 1):
+                    queues[0].put(_DONE)
+
+        threads.append(threading.Thread(target=feed, daemon=True, name="pipeline-feed"))
+        for t in threads:
+            t.start()
+
+        # reorder: hold finished items until every earlier one is out
+        pending, next_seq = {}, 0
+        while True:
+            entry = queues[-1].get()
+            if entry is _DONE:
+                break
+            seq, item, error, _ = entry
+            pending[seq] = (item, error)
+            while next_seq in pending:
+                yield pending.pop(next_seq)
+                next_seq += 1
+        for seq in sorted(pending):
+            yield pending.pop(seq)
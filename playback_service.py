@@ -0,0 +1,340 @@
+"""
+Audio playback as its own consumer thread, so the watcher keeps polling and processing
+while pages are read aloud (drive_ocr_watcher.PLAYBACK_MODE = "service").
+
+The queue lives in memory (a priority heap); every change is appended as one JSON line to
+QUEUE_LOG, which is replayed (and compacted) on start. Other processes can steer a running
+watcher by appending to the same log:
+
+    python playback_service.py list
+    python playback_service.py skip           # stop the page that is playing
+    python playback_service.py skip <id>      # drop a queued page
+    python playback_service.py next <id>      # play it next
+    python playback_service.py play-held      # play the pages queued "for later"
+"""
+import heapq
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+# --- CONFIG ---
+QUEUE_LOG = "audio_queue.log"
+# Queue file of the inline playback, imported once as "held" entries
+LEGACY_QUEUE_FILE = "audio_queue.json"
+# Player: "playsound" (in a child process, so it can be stopped) or a command list
+# the audio path is appended to, e.g. ["mpg123", "-q"] or ["ffplay", "-nodisp", "-autoexit"]
+PLAYER = "playsound"
+# How often the service checks the log for changes made by other processes
+SYNC_INTERVAL = 0.5
+
+PRIORITY_NORMAL = 0
+PRIORITY_NEXT = 10
+
+_PENDING = ("queued", "held", "playing")
+
+
+class PlaybackQueue:
+    """
+    Priority queue of audio files backed by an append-only log. An entry is "queued" (waits
+    for the player), "held" (waits for play-held), "playing", "done" or "skipped".
+    Higher priority plays first, equal priority in the order added. The files of temporary
+    entries (streamed TTS chunks) are deleted once played or skipped.
+    """
+
+    def __init__(self, log_path=QUEUE_LOG):
+        self.log_path = log_path
+        self.entries = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._offset = 0
+        self._lock = threading.Lock()
+        self.changed = threading.Condition(self._lock)
+
+    # ---------- Log ----------
+    def _apply(self, event):
+        op, entry_id = event["op"], event["id"]
+        if op == "add":
+            self.entries[entry_id] = {"id": entry_id, "path": event["path"], "priority": event.get("priority", 0),
+                                      "state": "held" if event.get("held") else "queued", "added_at": event.get("t"),
+                                      "temporary": event.get("temporary", False)}
+            self._push(entry_id)
+            return
+        entry = self.entries.get(entry_id)
+        if entry is None or entry["state"] not in _PENDING:
+            return
+        if op == "priority":
+            entry["priority"] = event["priority"]
+            self._push(entry_id)
+        elif op == "release" and entry["state"] == "held":
+            entry["state"] = "queued"
+            self._push(entry_id)
+        elif op == "start":
+            entry["state"] = "playing"
+        elif op in ("done", "skipped"):
+            entry["state"] = op
+
+    def _push(self, entry_id):
+        entry = self.entries[entry_id]
+        entry["seq"] = next(self._seq)
+        heapq.heappush(self._heap, (-entry["priority"], entry["seq"], entry_id))
+
+    def _sync(self):
+        """Apply log lines appended since the last read (by this process or another one)."""
+        if not os.path.exists(self.log_path):
+            return False
+        with open(self.log_path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        # an incomplete last line is picked up on the next read
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                self._apply(json.loads(line))
+            except (ValueError, KeyError):
+                continue
+        self._offset += end
+        return end > 0
+
+    def _append(self, events):
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(dict(event, t=time.time()), ensure_ascii=False) + "\n")
+        self._sync()
+        self.changed.notify_all()
+
+    def load(self, compact=True):
+        """
+        Replay the log and import the old audio_queue.json. With compact, the log is
+        rewritten with only the pending entries (a page cut off while playing is queued again).
+        """
+        with self._lock:
+            self._sync()
+            events = []
+            if os.path.exists(LEGACY_QUEUE_FILE):
+                try:
+                    with open(LEGACY_QUEUE_FILE, "r", encoding="utf-8") as f:
+                        legacy = json.load(f)
+                except ValueError:
+                    legacy = []
+                events = [{"op": "add", "id": uuid.uuid4().hex[:8], "path": p, "held": True} for p in legacy]
+                os.replace(LEGACY_QUEUE_FILE, LEGACY_QUEUE_FILE + ".migrated")
+            if compact:
+                for entry in self.entries.values():
+                    if entry["temporary"] and entry["state"] not in _PENDING:
+                        _remove_temporary(entry)
+                pending = sorted((e for e in self.entries.values() if e["state"] in _PENDING), key=lambda e: e["seq"])
+                events = [{"op": "add", "id": e["id"], "path": e["path"], "priority": e["priority"],
+                           "held": e["state"] == "held", "temporary": e["temporary"]} for e in pending] + events
+                tmp_path = self.log_path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    for event in events:
+                        f.write(json.dumps(dict(event, t=time.time()), ensure_ascii=False) + "\n")
+                os.replace(tmp_path, self.log_path)
+                self.entries, self._heap, self._offset = {}, [], 0
+                self._sync()
+            elif events:
+                self._append(events)
+        return self
+
+    # ---------- Producer / control side ----------
+    def add(self, paths, priority=PRIORITY_NORMAL, held=False, temporary=False):
+        ids = [uuid.uuid4().hex[:8] for _ in paths]
+        with self._lock:
+            self._append({"op": "add", "id": i, "path": p, "priority": priority, "held": held, "temporary": temporary}
+                         for i, p in zip(ids, paths))
+        return ids
+
+    def skip(self, entry_id=None):
+        """Skip a queued entry, or the one playing if entry_id is None. False if there was nothing to skip."""
+        with self._lock:
+            self._sync()
+            if entry_id is None:
+                entry_id = next((e["id"] for e in self.entries.values() if e["state"] == "playing"), None)
+            if entry_id not in self.entries or self.entries[entry_id]["state"] not in _PENDING:
+                return False
+            self._append([{"op": "skipped", "id": entry_id}])
+            return True
+
+    def prioritize(self, entry_id, priority=PRIORITY_NEXT):
+        with self._lock:
+            self._sync()
+            if entry_id not in self.entries or self.entries[entry_id]["state"] not in ("queued", "held"):
+                return False
+            self._append([{"op": "priority", "id": entry_id, "priority": priority}])
+            return True
+
+    def release_held(self):
+        """Move every held entry to the player; returns how many."""
+        with self._lock:
+            self._sync()
+            held = [e["id"] for e in self.entries.values() if e["state"] == "held"]
+            self._append({"op": "release", "id": i} for i in held)
+        return len(held)
+
+    def pending(self, state=None):
+        with self._lock:
+            self._sync()
+            return [dict(e) for e in sorted(self.entries.values(), key=lambda e: (-e["priority"], e["seq"]))
+                    if e["state"] in _PENDING and state in (None, e["state"])]
+
+    # ---------- Consumer side ----------
+    def next(self, timeout=None):
+        """Highest-priority queued entry (marked "playing"), or None after timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while True:
+                self._sync()
+                while self._heap:
+                    _, seq, entry_id = heapq.heappop(self._heap)
+                    entry = self.entries[entry_id]
+                    # stale heap items (reprioritized, held, finished) are dropped here
+                    if entry["state"] == "queued" and entry["seq"] == seq:
+                        self._append([{"op": "start", "id": entry_id}])
+                        return dict(entry)
+                remaining = SYNC_INTERVAL if deadline is None else min(SYNC_INTERVAL, deadline - time.monotonic())
+                if remaining <= 0:
+                    return None
+                self.changed.wait(remaining)
+
+    def state(self, entry_id):
+        with self._lock:
+            self._sync()
+            return self.entries[entry_id]["state"]
+
+    def finish(self, entry_id):
+        with self._lock:
+            self._append([{"op": "done", "id": entry_id}])
+
+
+def _remove_temporary(entry):
+    try:
+        os.remove(entry["path"])
+    except FileNotFoundError:
+        pass
+
+
+def _player_command(path):
+    if PLAYER == "playsound":
+        return [sys.executable, "-c", "import sys; from playsound import playsound; playsound(sys.argv[1])", path]
+    return list(PLAYER) + [path]
+
+
+class PlaybackService:
+    """Plays the queue on a daemon thread; the player runs as a child process so a skip can stop it."""
+
+    def __init__(self, queue=None):
+        self.queue = queue if queue is not None else PlaybackQueue().load()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="playback", daemon=True)
+        self._thread.start()
+        pending = len(self.queue.pending("queued"))
+        print(f"[AUDIO] Playback service started ({pending} queued)")
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        with self.queue.changed:
+            self.queue.changed.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def enqueue(self, paths, priority=PRIORITY_NORMAL, held=False, temporary=False):
+        return self.queue.add(paths, priority, held, temporary)
+
+    def _run(self):
+        while not self._stop.is_set():
+            entry = self.queue.next(timeout=SYNC_INTERVAL)
+            if entry is None:
+                continue
+            print(f"[AUDIO] Playing {entry['path']}")
+            # stderr goes to a temp file, not a pipe: a chatty player would fill a pipe nobody
+            # reads until it exits, and stall
+            with tempfile.TemporaryFile() as stderr:
+                try:
+                    player = subprocess.Popen(_player_command(entry["path"]), stdout=subprocess.DEVNULL, stderr=stderr)
+                except OSError as e:
+                    print("[AUDIO PLAY ERROR]", e)
+                    self.queue.finish(entry["id"])
+                    continue
+                while player.poll() is None:
+                    if self._stop.wait(SYNC_INTERVAL) or self.queue.state(entry["id"]) == "skipped":
+                        player.terminate()
+                        player.wait()
+                        break
+                if self.queue.state(entry["id"]) == "skipped":
+                    print(f"[AUDIO] Skipped {entry['path']}")
+                elif not self._stop.is_set():
+                    if player.returncode:
+                        stderr.seek(0)
+                        print("[AUDIO PLAY ERROR]", stderr.read().decode(errors="replace").strip()[-300:])
+                    self.queue.finish(entry["id"])
+                else:
+                    continue  # cut off by stop(): queued again on the next start
+            if entry["temporary"]:
+                _remove_temporary(entry)
+
+
+class AudioStream:
+    """
+    Hands audio chunks of several files to the player while they are synthesized
+    (text_to_speech's on_chunk), keeping the files in order: chunks of file i are queued
+    right away once files 0..i-1 are done, and held back until then otherwise.
+    Chunks are queued as temporary entries: the service deletes each one after playing it.
+    """
+
+    def __init__(self, player):
+        self.player = player
+        self._lock = threading.Lock()
+        self._current = 0
+        self._held = {}
+        self._done = set()
+
+    def chunk(self, index, path):
+        with self._lock:
+            if index == self._current:
+                self.player.enqueue([path], temporary=True)
+            else:
+                self._held.setdefault(index, []).append(path)
+
+    def done(self, index):
+        """File index has no more chunks (also call it for files that failed or produced no audio)."""
+        with self._lock:
+            self._done.add(index)
+            while self._current in self._done:
+                self._current += 1
+                if self._held.get(self._current):
+                    self.player.enqueue(self._held.pop(self._current), temporary=True)
+
+
+def main():
+    queue = PlaybackQueue()
+    args = sys.argv[1:]
+    if args in ([], ["list"]):
+        for entry in queue.pending():
+            print(f"{entry['id']}  {entry['state']:<8} p={entry['priority']:<3} {entry['path']}")
+    elif args[0] == "skip" and len(args) <= 2:
+        if not queue.skip(args[1] if len(args) == 2 else None):
+            print("[AUDIO] Nothing to skip.")
+            sys.exit(1)
+    elif args[0] == "next" and len(args) == 2:
+        if not queue.prioritize(args[1]):
+            print(f"[AUDIO] {args[1]} is not waiting in the queue.")
+            sys.exit(1)
+    elif args == ["play-held"]:
+        print(f"[AUDIO] {queue.release_held()} held file(s) queued for playback.")
+    else:
+        print(__doc__)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
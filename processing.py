@@ -2,14 +2,48 @@ import cv2
 import numpy as np
 import pytesseract
 from PIL import Image
-import matplotlib.pyplot as plt
 import os
-from gtts import gTTS
-from rembg import remove
-from PIL import Image
+import subprocess
+import threading
+import metrics
+# rembg (with onnxruntime) and gtts are imported where they are used, so importing
+# this module stays cheap for runs that never reach those stages
 
 # --- CONFIG ---
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+# Skew detection: "projection" (brute force, 91 full-size rotations) or "fast" (coarse-to-fine)
+DESKEW_MODE = "projection"
+# Background removal: "rembg" (rembg.remove at full resolution) or "pool" (background_removal.BackgroundRemover);
+# both use the matting model background_removal.REMBG_MODEL
+BG_REMOVAL_MODE = "rembg"
+# OCR engine: "pytesseract" (tesseract subprocess per call) or "tesserocr" (ocr_engine.TesseractPool, in-process;
+# needs: pip install tesserocr, which is not in requirements.txt as it builds against the Tesseract headers)
+OCR_ENGINE = "pytesseract"
+# tesserocr only: OCR the page's layout blocks in parallel
+OCR_PARALLEL_BLOCKS = False
+# Enhancement: "full" (original float/BGR path) or "lowmem" (uint8 grayscale buffers reused
+# in place, LUT point ops, neighborhood filters run on overlapping tiles of ENHANCE_TILE_SIZE)
+ENHANCE_MODE = "full"
+ENHANCE_TILE_SIZE = 2048
+# Page region after background removal: "none" (whole frame to enhancement and OCR), "bbox"
+# (crop to the foreground's bounding box) or "rectify" (warp the page's four corners to an
+# upright rectangle; falls back to the bounding box when the outline is not a quadrilateral)
+PAGE_CROP_MODE = "none"
+# Margin kept around the bounding box, as a fraction of the page's longer side
+PAGE_CROP_MARGIN = 0.02
+# A foreground smaller than this share of the frame is not trusted, the whole frame is kept
+PAGE_MIN_AREA = 0.05
+# Text size before enhancement and OCR: "none" (native resolution) or "xheight" (rescale the
+# page so its lowercase letters are TEXT_X_HEIGHT px tall; tesseract reads best around
+# 20-30 px, larger text only costs time and smaller text loses accuracy)
+TEXT_SCALE_MODE = "none"
+TEXT_X_HEIGHT = 20
+# Limits of the rescale factor; within TEXT_SCALE_TOLERANCE of 1.0 the page is left as is
+TEXT_SCALE_LIMITS = (0.2, 4.0)
+TEXT_SCALE_TOLERANCE = 0.15
+# TTS: False = one gTTS request per page; True = sentence chunks synthesized in parallel
+# by tts_engine (backend chosen by tts_engine.TTS_BACKEND, "espeak" works offline)
+TTS_CHUNKED = False
 
 # ---------- Utility Functions ----------
 def ensure_gray(img):
@@ -122,9 +156,118 @@ def detect_skew_angle_projection(image):
     best_angle = angles[np.argmax(scores)]
     return best_angle
 
+def _projection_scores(ys, xs, angles, n_bins, angles_per_chunk=8):
+    """
+    Std of the row projection for every angle, computed from foreground points only.
+    Angles are processed in chunks so the (angles x points) temporaries stay small.
+    """
+    scores = np.empty(len(angles))
+    for start in range(0, len(angles), angles_per_chunk):
+        chunk = angles[start:start + angles_per_chunk]
+        rad = np.deg2rad(chunk)[:, None]
+        # row coordinate after cv2.getRotationMatrix2D(center, angle): y' = -sin*x + cos*y
+        rows = -np.sin(rad) * xs[None, :] + np.cos(rad) * ys[None, :]
+        rows = np.clip(np.round(rows + n_bins / 2).astype(np.int64), 0, n_bins - 1)
+        rows += (np.arange(len(chunk)) * n_bins)[:, None]
+        proj = np.bincount(rows.ravel(), minlength=len(chunk) * n_bins)
+        scores[start:start + len(chunk)] = proj.reshape(len(chunk), n_bins).std(axis=1)
+    return scores
+
+def _foreground_points(thresh, max_points, rng):
+    """Centered (y, x) coordinates of foreground pixels, randomly subsampled to max_points."""
+    ys, xs = np.nonzero(thresh)
+    if len(ys) > max_points:
+        keep = rng.choice(len(ys), max_points, replace=False)
+        ys, xs = ys[keep], xs[keep]
+    h, w = thresh.shape[:2]
+    # jitter inside each pixel so axis-aligned angles don't get an unfair binning advantage
+    ys = ys + rng.random(len(ys)) - h / 2.0
+    xs = xs + rng.random(len(xs)) - w / 2.0
+    return ys, xs
+
+def detect_skew_angle_fast(image, coarse_size=512, fine_size=1600, fine_step=0.1, max_points=50000):
+    """
+    Coarse-to-fine version of detect_skew_angle_projection.
+    Searches -45..45 in 1° steps on a downsampled level, then refines +-1° in fine_step
+    steps on a larger level. Only foreground pixels are projected, nothing is rotated.
+    """
+    gray = ensure_gray(image)
+    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+    rng = np.random.default_rng(0)
+
+    def level(max_side):
+        h, w = thresh.shape[:2]
+        scale = min(1.0, max_side / max(h, w))
+        if scale < 1.0:
+            small = cv2.resize(thresh, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+            small = small > 127
+        else:
+            small = thresh > 0
+        ys, xs = _foreground_points(small, max_points, rng)
+        n_bins = int(np.ceil(np.hypot(*small.shape[:2]))) + 2
+        return ys, xs, n_bins
+
+    ys, xs, n_bins = level(coarse_size)
+    if len(ys) == 0:
+        return 0.0
+    coarse = np.arange(-45, 46, 1, dtype=np.float64)
+    best = coarse[np.argmax(_projection_scores(ys, xs, coarse, n_bins))]
+
+    ys, xs, n_bins = level(fine_size)
+    if len(ys) == 0:
+        return float(best)
+    fine = np.arange(best - 1.0, best + 1.0 + fine_step / 2, fine_step)
+    fine = fine[(fine >= -45) & (fine <= 45)]
+    best = fine[np.argmax(_projection_scores(ys, xs, fine, n_bins))]
+    return float(round(best, 2)) + 0.0
+
+def detect_skew_angle(image, mode=None):
+    """Dispatch to the skew detector selected by mode (defaults to DESKEW_MODE)."""
+    mode = mode or DESKEW_MODE
+    if mode == "fast":
+        return detect_skew_angle_fast(image)
+    if mode == "projection":
+        return detect_skew_angle_projection(image)
+    raise ValueError(f"Unknown deskew mode: {mode}")
+
+_background_remover = None
+_background_remover_lock = threading.Lock()
+
+def get_background_remover():
+    """Shared BackgroundRemover, created on first use."""
+    global _background_remover
+    with _background_remover_lock:
+        if _background_remover is None:
+            from background_removal import BackgroundRemover
+            _background_remover = BackgroundRemover()
+    return _background_remover
+
+_rembg_session = None
+_rembg_session_lock = threading.Lock()
+
+def get_rembg_session():
+    """rembg session of background_removal.REMBG_MODEL (the model the pool mode uses too), created on first use."""
+    global _rembg_session
+    with _rembg_session_lock:
+        if _rembg_session is None:
+            from rembg import new_session
+            from background_removal import REMBG_MODEL
+            _rembg_session = new_session(REMBG_MODEL)
+    return _rembg_session
+
 def remove_background(image_path, output_path):
+    if BG_REMOVAL_MODE == "pool":
+        base, _ = os.path.splitext(output_path)
+        output_path = base + ".png"
+        image = cv2.imread(image_path)
+        if image is None:
+            raise IOError(f"Could not read {image_path}")
+        cv2.imwrite(output_path, get_background_remover().remove_rgba(image))
+        return output_path
+
+    from rembg import remove
     input_image = Image.open(image_path)
-    output_image = remove(input_image)
+    output_image = remove(input_image, session=get_rembg_session())
 
     if output_image == "RGBA":
         output_image = output_image.convert("RGB")
@@ -134,11 +277,266 @@ def remove_background(image_path, output_path):
     output_image.save(output_path)
     return output_path
 
+def remove_background_array(image):
+    """
+    In-memory version of remove_background: BGR array in, BGR array out.
+    Gives the same pixels cv2.imread returns for the PNG written by remove_background
+    (alpha dropped, background black).
+    """
+    if BG_REMOVAL_MODE == "pool":
+        return get_background_remover().remove(image)[0]
+
+    from rembg import remove
+    input_image = Image.fromarray(cv2.cvtColor(ensure_bgr(image), cv2.COLOR_BGR2RGB))
+    output_image = np.asarray(remove(input_image, session=get_rembg_session()))
+    if output_image.ndim == 3 and output_image.shape[2] == 4:
+        return cv2.cvtColor(output_image, cv2.COLOR_RGBA2BGR)
+    return cv2.cvtColor(output_image, cv2.COLOR_RGB2BGR)
+
+# ---------- Page Region ----------
+def _order_corners(quad):
+    """Corners as top-left, top-right, bottom-right, bottom-left."""
+    s, d = quad.sum(axis=1), np.diff(quad, axis=1).ravel()
+    return np.float32([quad[np.argmin(s)], quad[np.argmin(d)], quad[np.argmax(s)], quad[np.argmax(d)]])
+
+def rectify_page(image, quad):
+    """Warp the quadrilateral quad (4x2 points) of image to an upright rectangle."""
+    tl, tr, br, bl = _order_corners(quad)
+    width = int(round(max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl))))
+    height = int(round(max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr))))
+    target = np.float32([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]])
+    matrix = cv2.getPerspectiveTransform(np.float32([tl, tr, br, bl]), target)
+    return cv2.warpPerspective(image, matrix, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+def find_page(image, max_side=1024, open_size=5):
+    """
+    Outline of the page in a background-removed image: (bounding box x, y, w, h, corner quad
+    or None), or None without a usable foreground. rembg's alpha is soft, so the background is
+    dark but rarely exactly black: foreground is what keeps at least half the brightness of the
+    page (its 99th percentile), and a morphological open drops specks and thin bridges.
+    The mask is searched on a copy downsampled to max_side; coordinates are full resolution.
+    """
+    h, w = image.shape[:2]
+    scale = min(1.0, max_side / max(h, w))
+    small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else image
+    value = small.max(axis=2) if small.ndim == 3 else small
+    level = np.percentile(value, 99)
+    if level == 0:
+        return None
+    mask = np.uint8(value >= 0.5 * level) * 255
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (open_size, open_size))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    page = max(contours, key=cv2.contourArea)
+    if cv2.contourArea(page) < PAGE_MIN_AREA * mask.size:
+        return None
+    x, y, bw, bh = cv2.boundingRect(page)
+    approx = cv2.approxPolyDP(page, 0.02 * cv2.arcLength(page, True), True)
+    quad = approx.reshape(4, 2) / scale if len(approx) == 4 and cv2.isContourConvex(approx) else None
+    return (int(x / scale), int(y / scale), int(np.ceil(bw / scale)), int(np.ceil(bh / scale))), quad
+
+def crop_to_page(image, mode=None, margin=None):
+    """Only the page of a background-removed image, per PAGE_CROP_MODE; the image itself if no page is found."""
+    mode = mode or PAGE_CROP_MODE
+    if mode == "none":
+        return image
+    if mode not in ("bbox", "rectify"):
+        raise ValueError(f"Unknown page crop mode: {mode}")
+    margin = PAGE_CROP_MARGIN if margin is None else margin
+    with metrics.stage_timer("enhance.crop_to_page", image=image) as rec:
+        found = find_page(image)
+        if found is None:
+            metrics.log("INFO", "No page outline found, keeping the whole frame")
+            rec["action"] = "none"
+            return image
+        (x, y, bw, bh), quad = found
+        if mode == "rectify" and quad is not None:
+            page = rectify_page(image, quad)
+            rec["action"] = "rectify"
+        else:
+            m = int(margin * max(bw, bh))
+            h, w = image.shape[:2]
+            page = image[max(0, y - m):min(h, y + bh + m), max(0, x - m):min(w, x + bw + m)]
+            rec["action"] = "bbox"
+        rec["kept"] = round(page.shape[0] * page.shape[1] / (image.shape[0] * image.shape[1]), 3)
+    metrics.log("INFO", f"Cropped to page ({rec['action']}): {page.shape[1]}x{page.shape[0]}, {rec['kept']:.0%} of the frame")
+    return page
+
+# ---------- Text Size ----------
+def estimate_x_height(image, max_side=2000, min_share=0.3):
+    """
+    Dominant lowercase letter height in px, from the heights of the dark connected components
+    (letters). The heights are histogrammed on a log scale, weighted by ink area, and the
+    lowest strong peak is taken: ascenders and capitals form a second peak ~1.4x higher.
+    None when there are too few components or no peak holds min_share of the ink (e.g. heavy noise).
+    """
+    gray = ensure_gray(image)
+    scale = min(1.0, max_side / max(gray.shape))
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    heights, widths, areas = stats[1:, cv2.CC_STAT_HEIGHT], stats[1:, cv2.CC_STAT_WIDTH], stats[1:, cv2.CC_STAT_AREA]
+    # dots and specks below 4 px, rules, pictures and page edges above 1/20 of the page
+    keep = (heights >= 4) & (widths >= 2) & (heights < gray.shape[0] / 20) & (widths < gray.shape[1] / 10)
+    if keep.sum() < 20:
+        return None
+    heights, areas = heights[keep], areas[keep]
+    log_h = np.log(heights)
+    counts, edges = np.histogram(log_h, np.arange(np.log(4), log_h.max() + 0.1, 0.1), weights=areas)
+    counts = np.convolve(counts, [1, 2, 1], "same")
+    peak = int(np.argmax(counts >= 0.6 * counts.max()))
+    in_peak = (log_h >= edges[max(0, peak - 1)]) & (log_h < edges[min(len(edges) - 1, peak + 2)])
+    if areas[in_peak].sum() < min_share * areas.sum():
+        return None
+    return float(np.median(heights[in_peak])) / scale
+
+def normalize_text_scale(image, mode=None, target=None):
+    """image rescaled so its x-height is target px (TEXT_SCALE_MODE); unchanged when unsure or already close."""
+    mode = mode or TEXT_SCALE_MODE
+    if mode == "none":
+        return image
+    if mode != "xheight":
+        raise ValueError(f"Unknown text scale mode: {mode}")
+    target = target or TEXT_X_HEIGHT
+    with metrics.stage_timer("enhance.normalize_scale", image=image) as rec:
+        x_height = estimate_x_height(image)
+        rec["x_height"] = x_height
+        if x_height is None:
+            metrics.log("INFO", "Text height unclear, keeping the resolution")
+            return image
+        factor = float(np.clip(target / x_height, *TEXT_SCALE_LIMITS))
+        rec["scale"] = round(factor, 3)
+        if abs(factor - 1) <= TEXT_SCALE_TOLERANCE:
+            return image
+        interpolation = cv2.INTER_AREA if factor < 1 else cv2.INTER_CUBIC
+        image = cv2.resize(image, None, fx=factor, fy=factor, interpolation=interpolation)
+    metrics.log("INFO", f"Text height {x_height:.1f}px, rescaled x{factor:.2f} to {image.shape[1]}x{image.shape[0]}")
+    return image
+
+# ---------- Low-memory Enhancement ----------
+def gamma_lut(gamma):
+    """256-entry table giving the same values as fix_brightness's float np.power."""
+    return np.uint8(np.clip(np.power(np.arange(256) / 255.0, gamma) * 255, 0, 255))
+
+def _run_tiled(fn, src, dst, overlap, tile_size=None):
+    """
+    dst = fn(src) computed on tiles of tile_size with `overlap` extra pixels on each side.
+    With overlap >= the filter radius the result equals fn on the whole image, but the
+    filter's temporaries are only tile-sized. src and dst must be different buffers.
+    """
+    tile_size = tile_size or ENHANCE_TILE_SIZE
+    h, w = src.shape[:2]
+    for y0 in range(0, h, tile_size):
+        for x0 in range(0, w, tile_size):
+            y1, x1 = min(h, y0 + tile_size), min(w, x0 + tile_size)
+            ty0, tx0 = max(0, y0 - overlap), max(0, x0 - overlap)
+            ty1, tx1 = min(h, y1 + overlap), min(w, x1 + overlap)
+            out = fn(src[ty0:ty1, tx0:tx1])
+            dst[y0:y1, x0:x1] = out[y0 - ty0:y1 - ty0, x0 - tx0:x1 - tx0]
+    return dst
+
+def _normalize_lighting_tile(gray):
+    return cv2.divide(gray, cv2.GaussianBlur(gray, (55, 55), 0), scale=255)
+
+def enhance_for_ocr_lowmem(image, deskew_mode=None, tile_size=None):
+    """
+    Same steps and decisions as the full enhance_for_ocr_auto, but everything stays in one
+    or two uint8 grayscale buffers: no BGR round trips, gamma through a lookup table, CLAHE
+    into the spare buffer, and the 55px/31px/median filters on overlapping tiles.
+    Returns a single-channel image (the full path returns the same pixels as 3-channel BGR).
+    """
+    gray = ensure_gray(image)
+    if gray is image:
+        gray = gray.copy()  # the buffers below are overwritten, keep the caller's image intact
+    spare = np.empty_like(gray)
+
+    with metrics.stage_timer("enhance.analyze", image=gray) as rec:
+        mean, std = cv2.meanStdDev(gray)
+        brightness, contrast = float(mean[0, 0]), float(std[0, 0])
+        variance = contrast ** 2
+        info = {
+            "brightness": brightness,
+            "contrast": contrast,
+            "is_dark": brightness < 80,
+            "is_bright": brightness > 180,
+            "low_contrast": contrast < 40,
+            "is_noisy": variance > 2000,
+        }
+        rec.update(info)
+    metrics.log("INFO", f"Image analysis: {info}")
+
+    dark_strength = max(0, min(1, (100 - brightness) / 100)) if info["is_dark"] else 0
+    contrast_strength = max(0, min(1, (40 - contrast) / 40)) if info["low_contrast"] else 0
+    noise_strength = max(0, min(1, (variance - 2000) / 3000)) if info["is_noisy"] else 0
+    metrics.log("INFO", f"Adaptive strength: dark={dark_strength:.2f}, contrast={contrast_strength:.2f}, noise={noise_strength:.2f}")
+
+    if dark_strength > 0:
+        metrics.log("ACTION", f"Brightness correction (strength={dark_strength:.2f})")
+        with metrics.stage_timer("enhance.fix_brightness", image=gray, strength=dark_strength):
+            # fix_brightness picks the gamma from the mean, which is still `brightness` here
+            strength = 1.0 + dark_strength
+            gamma = 0.6 * strength if brightness < 100 else 1.4 * strength if brightness > 160 else 1.0
+            cv2.LUT(gray, gamma_lut(gamma), dst=gray)
+            cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8)).apply(gray, spare)
+            gray, spare = spare, gray
+
+    if noise_strength > 0:
+        metrics.log("ACTION", f"Noise reduction (strength={noise_strength:.2f})")
+        with metrics.stage_timer("enhance.reduce_noise", image=gray, strength=noise_strength):
+            k = 3 if 1.0 + noise_strength < 1.5 else 5
+            _run_tiled(lambda t: cv2.medianBlur(t, k), gray, spare, k // 2, tile_size)
+            gray, spare = spare, gray
+
+    if contrast_strength > 0:
+        metrics.log("ACTION", f"Contrast enhancement (strength={contrast_strength:.2f})")
+        with metrics.stage_timer("enhance.enhance_contrast", image=gray, strength=contrast_strength):
+            # CLAHE's 8x8 grid spans the whole image, so it is not tiled (its own memory is small)
+            clip = 2.0 + (1.0 + contrast_strength)
+            cv2.createCLAHE(clipLimit=clip, tileGridSize=(8, 8)).apply(gray, spare)
+            gray, spare = spare, gray
+
+    if not (info["is_dark"] or info["low_contrast"] or info["is_noisy"]):
+        metrics.log("ACTION", "Normal image -> normalize lighting")
+        with metrics.stage_timer("enhance.normalize_lighting", image=gray):
+            _run_tiled(_normalize_lighting_tile, gray, spare, 27, tile_size)
+            gray, spare = spare, gray
+
+    metrics.log("ACTION", "Adaptive binarization...")
+    with metrics.stage_timer("enhance.binarize", image=gray):
+        # the 1x1 morphological opening of the full path is an identity, so it is left out
+        _run_tiled(binarize_adaptive, gray, spare, 15, tile_size)
+        gray = spare
+        del spare
+
+    metrics.log("ACTION", "Deskewing...")
+    with metrics.stage_timer("enhance.detect_skew", image=gray, mode=deskew_mode or DESKEW_MODE) as rec:
+        detected_angle = detect_skew_angle(gray, deskew_mode)
+        rec["angle"] = detected_angle
+    metrics.log("INFO", f"Detected (text-based) angle: {detected_angle:.2f}°")
+    if detected_angle != 0:
+        with metrics.stage_timer("enhance.deskew", image=gray):
+            gray = deskew_and_expand(gray, detected_angle)
+
+    metrics.log("DONE", "Enhancement completed ✅")
+    return gray
+
 # ---------- OCR & Enhancement Pipeline ----------
-def enhance_for_ocr_auto(image):
+def enhance_for_ocr_auto(image, deskew_mode=None, mode=None):
+    mode = mode or ENHANCE_MODE
+    # everything from here on (filters, deskew, binarization, OCR) runs at the normalized size
+    image = normalize_text_scale(image)
+    if mode == "lowmem":
+        return enhance_for_ocr_lowmem(image, deskew_mode)
+    if mode != "full":
+        raise ValueError(f"Unknown enhance mode: {mode}")
     img = image.copy()
-    info = analyze_image(img)
-    print("[INFO] Image analysis:", info)
+    with metrics.stage_timer("enhance.analyze", image=img) as rec:
+        info = analyze_image(img)
+        rec.update(info)
+    metrics.log("INFO", f"Image analysis: {info}")
 
     processed = img.copy()
 
@@ -146,68 +544,122 @@ def enhance_for_ocr_auto(image):
     dark_strength = max(0, min(1, (100 - info["brightness"]) / 100)) if info["is_dark"] else 0
     contrast_strength = max(0, min(1, (40 - info["contrast"]) / 40)) if info["low_contrast"] else 0
     noise_strength = max(0, min(1, (np.var(ensure_gray(img)) - 2000) / 3000)) if info["is_noisy"] else 0
-    print(f"[INFO] Adaptive strength: dark={dark_strength:.2f}, contrast={contrast_strength:.2f}, noise={noise_strength:.2f}")
+    metrics.log("INFO", f"Adaptive strength: dark={dark_strength:.2f}, contrast={contrast_strength:.2f}, noise={noise_strength:.2f}")
 
     # ---------- Apply Enhancements ----------
     if dark_strength > 0:
-        print(f"[ACTION] Brightness correction (strength={dark_strength:.2f})")
-        processed = fix_brightness(ensure_bgr(processed), 1.0 + dark_strength)
-        processed = enhance_contrast(ensure_bgr(processed), 1.0)
+        metrics.log("ACTION", f"Brightness correction (strength={dark_strength:.2f})")
+        with metrics.stage_timer("enhance.fix_brightness", image=processed, strength=dark_strength):
+            processed = fix_brightness(ensure_bgr(processed), 1.0 + dark_strength)
+            processed = enhance_contrast(ensure_bgr(processed), 1.0)
 
     if noise_strength > 0:
-        print(f"[ACTION] Noise reduction (strength={noise_strength:.2f})")
-        processed = reduce_noise(ensure_bgr(processed), 1.0 + noise_strength)
+        metrics.log("ACTION", f"Noise reduction (strength={noise_strength:.2f})")
+        with metrics.stage_timer("enhance.reduce_noise", image=processed, strength=noise_strength):
+            processed = reduce_noise(ensure_bgr(processed), 1.0 + noise_strength)
 
     if contrast_strength > 0:
-        print(f"[ACTION] Contrast enhancement (strength={contrast_strength:.2f})")
-        processed = enhance_contrast(ensure_bgr(processed), 1.0 + contrast_strength)
+        metrics.log("ACTION", f"Contrast enhancement (strength={contrast_strength:.2f})")
+        with metrics.stage_timer("enhance.enhance_contrast", image=processed, strength=contrast_strength):
+            processed = enhance_contrast(ensure_bgr(processed), 1.0 + contrast_strength)
 
     if not (info["is_dark"] or info["low_contrast"] or info["is_noisy"]):
-        print("[ACTION] Normal image -> normalize lighting")
-        processed = normalize_lighting(ensure_bgr(processed))
+        metrics.log("ACTION", "Normal image -> normalize lighting")
+        with metrics.stage_timer("enhance.normalize_lighting", image=processed):
+            processed = normalize_lighting(ensure_bgr(processed))
 
-    print("[ACTION] Adaptive binarization...")
-    processed = binarize_adaptive(ensure_bgr(processed))
+    metrics.log("ACTION", "Adaptive binarization...")
+    with metrics.stage_timer("enhance.binarize", image=processed):
+        processed = binarize_adaptive(ensure_bgr(processed))
 
-    # Morphology cleanup
-    kernel = np.ones((1, 1), np.uint8)
-    processed = cv2.morphologyEx(processed, cv2.MORPH_OPEN, kernel)
+        # Morphology cleanup
+        kernel = np.ones((1, 1), np.uint8)
+        processed = cv2.morphologyEx(processed, cv2.MORPH_OPEN, kernel)
 
-    print("[ACTION] Deskewing...")
+    metrics.log("ACTION", "Deskewing...")
     # แก้การ deskew: ตรวจหามุมเอียงและใช้ deskew_and_expand เพื่อป้องกันตกขอบ
-    detected_angle = detect_skew_angle_projection(ensure_bgr(processed))  # ฟังก์ชันนี้ควร return มุมเอียง
-    print(f"[INFO] Detected (text-based) angle: {detected_angle:.2f}°")
-    processed = deskew_and_expand(ensure_bgr(processed), detected_angle)
+    with metrics.stage_timer("enhance.detect_skew", image=processed, mode=deskew_mode or DESKEW_MODE) as rec:
+        detected_angle = detect_skew_angle(processed, deskew_mode)  # ฟังก์ชันนี้ควร return มุมเอียง
+        rec["angle"] = detected_angle
+    metrics.log("INFO", f"Detected (text-based) angle: {detected_angle:.2f}°")
+    with metrics.stage_timer("enhance.deskew", image=processed):
+        processed = deskew_and_expand(ensure_bgr(processed), detected_angle)
 
-    print("[DONE] Enhancement completed ✅")
+    metrics.log("DONE", "Enhancement completed ✅")
     return processed
 
 # ---------- OCR & Speech ----------
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+def get_ocr_pool():
+    """Shared TesseractPool, created on first use."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            from ocr_engine import TesseractPool
+            _ocr_pool = TesseractPool()
+    return _ocr_pool
+
+def ocr_with_confidences(image):
+    """OCR through the in-process engine. Returns (text, [(word, confidence), ...])."""
+    pool = get_ocr_pool()
+    return pool.ocr_blocks(image) if OCR_PARALLEL_BLOCKS else pool.ocr(image)
+
 def pytesseract_ocr(image):
+    if OCR_ENGINE == "tesserocr":
+        return ocr_with_confidences(image)[0]
     pil_img = Image.fromarray(image)
     config = '--psm 3'
     text = pytesseract.image_to_string(pil_img, lang='eng', config=config)
     # print("\n--- OCR Result ---\n", text)
     return text
 
-def text_to_speech(text: str, base_name:str):
-    """Convert text to an MP3 file and return its local path."""
+def text_to_speech(text: str, base_name:str, on_chunk=None):
+    """
+    Convert text to an audio file and return its local path.
+    In chunked mode on_chunk(path) is called for each sentence chunk as soon as it is ready.
+    """
     if not text.strip():
         print("[INFO] No text to speak.")
         return None
     os.makedirs("downloads/audio", exist_ok=True)
-    audio_path = os.path.join("downloads", "audio", f"{base_name}.mp3")
-    tts = gTTS(text)
-    tts.save(audio_path)
+    if TTS_CHUNKED or on_chunk is not None:
+        from tts_engine import text_to_speech_chunked
+        audio_path = text_to_speech_chunked(text, os.path.join("downloads", "audio"), base_name, on_chunk=on_chunk)
+    else:
+        from gtts import gTTS
+        audio_path = os.path.join("downloads", "audio", f"{base_name}.mp3")
+        tts = gTTS(text)
+        tts.save(audio_path)
     print(f"[TTS] Audio file saved -> {audio_path}")
     return audio_path
 
 
+def play_file(path, wait=True):
+    """Play an audio file with the system player; the path is passed as an argument, never through a shell."""
+    if os.name == "nt":
+        cmd = ["cmd", "/c", "start"] + (["/wait"] if wait else []) + ["", path]
+    else:
+        cmd = ["aplay" if path.endswith(".wav") else "mpg123", path]
+    try:
+        subprocess.run(cmd)
+    except OSError as e:
+        print("[AUDIO PLAY ERROR]", e)
+
 def speak_text(text):
     if not text.strip():
         print("[INFO] No text to speak.")
         return
-    tts = gTTS(text)
-    tts.save("output.mp3")
-    os.system("start output.mp3" if os.name == "nt" else "mpg123 output.mp3")
+    if not TTS_CHUNKED:
+        from gtts import gTTS
+        tts = gTTS(text)
+        tts.save("output.mp3")
+        play_file("output.mp3", wait=os.name != "nt")
+        return
+    # play each sentence chunk as soon as it is ready, the rest keeps synthesizing meanwhile
+    from tts_engine import synthesize_stream
+    for path in synthesize_stream(text, "speak_parts", "output"):
+        play_file(path)
+        os.remove(path)
 
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+
+CACHE_DIR = os.path.join("cache", "results")
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+TTS_CACHE_DIR = os.path.join("cache", "tts")
+TTS_CACHE_MAX_BYTES = 512 * 1024 ** 2
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def array_sha256(img):
+    """Content hash of a decoded image that was never written to a file."""
+    digest = hashlib.sha256(f"{img.shape}{img.dtype}".encode("ascii"))
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+def result_key(content_hash, settings):
+    """Cache key of a file's results: its content hash plus the settings that shaped them."""
+    return hashlib.sha256(f"{content_hash}\x00{settings!r}".encode("utf-8")).hexdigest()
+
+
+def text_key(text, *extra):
+    """Cache key of a text: whitespace-normalized, plus anything else the output depends on (e.g. voice)."""
+    normalized = " ".join(text.split())
+    return hashlib.sha256("\x00".join([normalized, *extra]).encode("utf-8")).hexdigest()
+
+
+class ContentCache:
+    """
+    Size-bounded LRU cache on disk. Every key is a directory holding named entries
+    (files); when the total size exceeds max_bytes the least recently used keys are evicted.
+    The LRU order survives restarts through the directories' mtimes.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes = OrderedDict()  # key -> bytes, least recently used first
+        os.makedirs(root, exist_ok=True)
+        entries = []
+        for key in os.listdir(root):
+            key_dir = os.path.join(root, key)
+            if os.path.isdir(key_dir):
+                size = sum(os.path.getsize(os.path.join(key_dir, n)) for n in os.listdir(key_dir))
+                entries.append((os.path.getmtime(key_dir), key, size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+        self._total = sum(self._sizes.values())
+
+    def _path(self, key, name):
+        return os.path.join(self.root, key, name)
+
+    def _touch(self, key):
+        self._sizes.move_to_end(key)
+        now = time.time()
+        os.utime(os.path.join(self.root, key), (now, now))
+
+    def get(self, key, name):
+        """Path of a cached entry, or None. It can be evicted at any time; read with copy_to / get_text."""
+        path = self._path(key, name)
+        with self._lock:
+            if key not in self._sizes or not os.path.exists(path):
+                return None
+            self._touch(key)
+        return path
+
+    def has(self, key, *names):
+        return all(self.get(key, name) is not None for name in names)
+
+    def get_text(self, key, name):
+        with self._lock:
+            if key not in self._sizes:
+                return None
+            try:
+                with open(self._path(key, name), "r", encoding="utf-8") as f:
+                    text = f.read()
+            except FileNotFoundError:
+                return None
+            self._touch(key)
+        return text
+
+    def _store(self, key, name, write):
+        path = self._path(key, name)
+        # written next to the key directories, not in one, so an eviction of the key
+        # can't delete it before the rename
+        tmp_path = os.path.join(self.root, f".{key}.tmp{threading.get_ident()}{os.path.splitext(name)[1]}")
+        write(tmp_path)
+        with self._lock:
+            os.makedirs(os.path.join(self.root, key), exist_ok=True)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path) - old_size
+            self._sizes[key] = self._sizes.get(key, 0) + size
+            self._total += size
+            self._touch(key)
+            self._evict(keep=key)
+        return path
+
+    def put_file(self, key, name, src_path):
+        return self._store(key, name, lambda dst: shutil.copyfile(src_path, dst))
+
+    def put_text(self, key, name, text):
+        def write(dst):
+            with open(dst, "w", encoding="utf-8") as f:
+                f.write(text)
+        return self._store(key, name, write)
+
+    def put_image(self, key, name, img):
+        def write(dst):
+            if not cv2.imwrite(dst, img):
+                raise IOError(f"Could not write {dst}")
+        return self._store(key, name, write)
+
+    def copy_to(self, key, name, dst_path):
+        """Copy a cached entry to dst_path; returns dst_path, or None on a miss."""
+        return dst_path if self.copy_all(key, {name: dst_path}) else None
+
+    def copy_all(self, key, targets):
+        """
+        Copy several entries of a key ({name: dst_path}) under the lock, so an eviction
+        can't remove them halfway; False on a miss (some targets may have been written).
+        """
+        with self._lock:
+            if key not in self._sizes:
+                return False
+            try:
+                for name, dst_path in targets.items():
+                    shutil.copyfile(self._path(key, name), dst_path)
+            except FileNotFoundError:
+                return False
+            self._touch(key)
+        return True
+
+    def _evict(self, keep):
+        while self._total > self.max_bytes and len(self._sizes) > 1:
+            key, size = next(iter(self._sizes.items()))
+            if key == keep:
+                self._sizes.move_to_end(key)
+                continue
+            del self._sizes[key]
+            self._total -= size
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            print(f"[CACHE] Evicted {key[:12]} ({size / 1024 ** 2:.1f} MB)")
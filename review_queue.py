@@ -0,0 +1,72 @@
+"""
+Review queue for pages (and documents with flagged pages) the watcher deferred
+(drive_ocr_watcher.DECISION_POLICY = "defer").
+Can be used while the watcher is running, decisions are picked up on its next poll.
+
+    python review_queue.py                     # go through the queue interactively
+    python review_queue.py list
+    python review_queue.py continue <file_id>  # process it anyway
+    python review_queue.py skip <file_id>
+"""
+import json
+import os
+import sys
+
+from job_store import JobStore
+
+DOWNLOAD_DIR = "downloads"
+
+
+def describe(job):
+    file = json.loads(job["file_json"]) if job["file_json"] else {}
+    title = file.get("title", job["file_id"])
+    local_path = os.path.join(DOWNLOAD_DIR, title)
+    where = local_path if os.path.exists(local_path) else "not downloaded"
+    return f"{title}  [{job['file_id']}]  {job['error'] or ''}  ({where})"
+
+
+def review(store):
+    jobs = store.deferred()
+    if not jobs:
+        print("[REVIEW] Nothing to review.")
+        return
+    print(f"[REVIEW] {len(jobs)} page(s) waiting.")
+    for job in jobs:
+        print(describe(job))
+        while True:
+            resp = input("  c = continue processing / s = skip / l = later / q = quit: ").strip().lower()
+            if resp in ("c", "continue", "y", "yes"):
+                store.resolve(job["file_id"], "continue")
+                print("  -> queued for processing")
+            elif resp in ("s", "skip", "n", "no"):
+                store.resolve(job["file_id"], "skip")
+                print("  -> skipped")
+            elif resp in ("q", "quit"):
+                return
+            elif resp not in ("l", "later", ""):
+                continue
+            break
+
+
+def main():
+    store = JobStore()
+    args = sys.argv[1:]
+    if not args:
+        review(store)
+    elif args[0] == "list":
+        for job in store.deferred():
+            print(describe(job))
+    elif args[0] in ("continue", "skip") and len(args) == 2:
+        try:
+            store.resolve(args[1], args[0])
+        except ValueError as e:
+            print(f"[REVIEW] {e}")
+            sys.exit(1)
+        print(f"[REVIEW] {args[1]}: {args[0]}")
+    else:
+        print(__doc__)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import os
+import re
+import shutil
+import subprocess
+import uuid
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+# --- CONFIG ---
+# "gtts" (Google TTS, needs network, mp3) or "espeak" (espeak-ng/espeak, offline, wav)
+TTS_BACKEND = "gtts"
+# Chunks synthesized at the same time
+TTS_WORKERS = 4
+# Sentences are packed into chunks of at most this many characters
+TTS_CHUNK_CHARS = 300
+ESPEAK_VOICE = "en"
+ESPEAK_SPEED = 160
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class TTSBackend:
+    """Turns one piece of text into one audio file."""
+    name = None
+    extension = None
+
+    def synthesize(self, text, out_path):
+        raise NotImplementedError
+
+    def settings(self):
+        """What the audio depends on besides the text (part of the TTS cache key)."""
+        return (self.name,)
+
+
+class GTTSBackend(TTSBackend):
+    name = "gtts"
+    extension = ".mp3"
+    lang = "en"
+
+    def synthesize(self, text, out_path):
+        from gtts import gTTS
+        gTTS(text, lang=self.lang).save(out_path)
+        return out_path
+
+    def settings(self):
+        return (self.name, self.lang)
+
+
+class EspeakBackend(TTSBackend):
+    """Offline engine, runs the espeak-ng (or espeak) binary."""
+    name = "espeak"
+    extension = ".wav"
+
+    def __init__(self, voice=ESPEAK_VOICE, speed=ESPEAK_SPEED):
+        self.binary = shutil.which("espeak-ng") or shutil.which("espeak")
+        if self.binary is None:
+            raise RuntimeError("espeak-ng/espeak not found on PATH")
+        self.voice = voice
+        self.speed = speed
+
+    def synthesize(self, text, out_path):
+        subprocess.run([self.binary, "-v", self.voice, "-s", str(self.speed), "-w", out_path, "--stdin"],
+                       input=text.encode("utf-8"), check=True, capture_output=True)
+        return out_path
+
+    def settings(self):
+        return (self.name, self.voice, str(self.speed))
+
+
+_BACKENDS = {"gtts": GTTSBackend, "espeak": EspeakBackend}
+_backend_instances = {}
+
+
+def get_backend(name=None):
+    name = name or TTS_BACKEND
+    if name not in _backend_instances:
+        if name not in _BACKENDS:
+            raise ValueError(f"Unknown TTS backend: {name}")
+        _backend_instances[name] = _BACKENDS[name]()
+    return _backend_instances[name]
+
+
+def split_sentences(text, max_chars=TTS_CHUNK_CHARS):
+    """Split text at sentence boundaries and pack sentences into chunks of at most max_chars."""
+    chunks, current = [], ""
+    for sentence in _SENTENCE_END.split(" ".join(text.split())):
+        # a single overlong sentence is cut at word boundaries
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def synthesize_stream(text, out_dir, base_name, backend=None, workers=TTS_WORKERS):
+    """
+    Synthesize text sentence by sentence, TTS_WORKERS chunks in parallel.
+    Generator yielding chunk file paths in reading order, each as soon as it is ready,
+    so playback of the first sentence can start while the rest is still being generated.
+    The file names carry a run id, so a rerun never overwrites parts still being played.
+    """
+    backend = backend or get_backend()
+    chunks = split_sentences(text)
+    os.makedirs(out_dir, exist_ok=True)
+    run_id = uuid.uuid4().hex[:8]
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="tts") as pool:
+        futures = [pool.submit(backend.synthesize, chunk,
+                               os.path.join(out_dir, f"{base_name}_{run_id}_part{i:03d}{backend.extension}"))
+                   for i, chunk in enumerate(chunks)]
+        for future in futures:
+            yield future.result()
+
+
+def join_audio(paths, out_path):
+    """Concatenate chunk files: mp3 frames can simply be appended, wav needs one header."""
+    if out_path.endswith(".wav"):
+        with wave.open(out_path, "wb") as out:
+            for i, path in enumerate(paths):
+                with wave.open(path, "rb") as part:
+                    if i == 0:
+                        out.setparams(part.getparams())
+                    out.writeframes(part.readframes(part.getnframes()))
+    else:
+        with open(out_path, "wb") as out:
+            for path in paths:
+                with open(path, "rb") as part:
+                    shutil.copyfileobj(part, out)
+    return out_path
+
+
+def text_to_speech_chunked(text, out_dir, base_name, backend=None, on_chunk=None):
+    """
+    Chunked, parallel synthesis of a whole page. on_chunk(path) is called for every chunk
+    in order as soon as it is ready (e.g. to start playback); returns the joined file's path.
+    Without on_chunk the chunk files are deleted here, with it they are the consumer's to delete.
+    """
+    backend = backend or get_backend()
+    parts_dir = os.path.join(out_dir, "parts")
+    parts = []
+    for path in synthesize_stream(text, parts_dir, base_name, backend):
+        parts.append(path)
+        if on_chunk is not None:
+            on_chunk(path)
+    out_path = join_audio(parts, os.path.join(out_dir, base_name + backend.extension))
+    if on_chunk is None:
+        # otherwise the parts belong to whoever is playing them
+        for path in parts:
+            os.remove(path)
+    return out_path